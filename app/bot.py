@@ -0,0 +1,90 @@
+# app/bot.py
+import logging
+from aiogram import Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
+
+from app.config import BOT_TOKEN, DUTY_CYCLE_WEEKS
+from app.db.database import is_schedule_empty
+from app.handlers import common, registration, callbacks, admin
+from app.middlewares import InFlightMiddleware
+from app.scheduler.locks import run_exclusive
+from app.scheduler.tasks import (
+    assign_duties, send_reminders, send_overdue_reminders, deliver_notifications, update_overdue_stats
+)
+
+
+def create_bot() -> Bot:
+    # Устанавливаем parse_mode через DefaultBotProperties
+    return Bot(
+        token=BOT_TOKEN,
+        default=DefaultBotProperties(parse_mode="Markdown")
+    )
+
+
+def create_dispatcher() -> Dispatcher:
+    dp = Dispatcher()
+
+    # Незавершенные обработчики дожидаются при остановке (см. app/shutdown.py)
+    dp.update.outer_middleware(InFlightMiddleware())
+
+    # Подключение роутеров (registration последним - он ловит любой текст)
+    dp.include_router(common.router)
+    dp.include_router(callbacks.router)
+    dp.include_router(admin.router)
+    dp.include_router(registration.router)
+    return dp
+
+
+async def create_initial_schedule(bot: Bot):
+    """Первичное создание расписания при запуске, если его еще нет."""
+    if await is_schedule_empty():
+        logging.info("База данных расписаний пуста. Создаю первоначальный план уборки...")
+        try:
+            # Под арендой: при нескольких воркерах план создаст только один
+            await run_exclusive("initial_assignment", assign_duties, bot)
+            logging.info("Первоначальный план уборки успешно создан.")
+        except Exception as e:
+            logging.error(f"Не удалось создать первоначальный план уборки: {e}")
+
+
+async def resume_notifications(bot: Bot):
+    """Досылает уведомления из outbox, которые не успел отправить прошлый запуск."""
+    try:
+        await deliver_notifications(bot)
+    except Exception as e:
+        logging.error(f"Не удалось дослать уведомления из outbox: {e}")
+
+
+def _add_exclusive_job(scheduler, trigger, job_name, job, bot, per_shard=False):
+    """Добавляет задачу через run_exclusive; триггер передается и ей - по нему считается ключ аренды."""
+    scheduler.add_job(run_exclusive, trigger, args=(job_name, job, bot),
+                      kwargs={"trigger": trigger, "per_shard": per_shard})
+
+
+def start_scheduler(bot: Bot) -> AsyncIOScheduler:
+    """
+    Настраивает и запускает планировщик. Каждая задача идет через run_exclusive,
+    так что при нескольких воркерах назначение выполняет один из них,
+    а волны напоминаний делятся между воркерами по чатам.
+    """
+    scheduler = AsyncIOScheduler(timezone="Europe/Moscow")
+
+    def cron(**fields):
+        return CronTrigger(timezone=scheduler.timezone, **fields)
+
+    _add_exclusive_job(scheduler, cron(day_of_week='mon', hour=10, minute=0, week=f'*/{DUTY_CYCLE_WEEKS}'),
+                       "assign_duties", assign_duties, bot)
+    _add_exclusive_job(scheduler, cron(day_of_week='mon,wed,sun', hour=12, minute=0),
+                       "send_reminders", send_reminders, bot, per_shard=True)
+    _add_exclusive_job(scheduler, cron(hour='9,15,21', minute=0),
+                       "send_overdue_reminders", send_overdue_reminders, bot, per_shard=True)
+    # Одним воркером, ночью после смены даты: дни просрочки прибавляются раз в сутки
+    _add_exclusive_job(scheduler, cron(hour=4, minute=0), "update_overdue_stats", update_overdue_stats, bot)
+    # Подбирает уведомления, забранные упавшим воркером (после истечения NOTIFICATION_CLAIM_SECONDS).
+    # Cron, а не interval: у всех воркеров одни и те же срабатывания, и аренда их различает
+    _add_exclusive_job(scheduler, cron(minute='*/10'), "deliver_notifications", deliver_notifications, bot)
+
+    scheduler.start()
+    return scheduler
@@ -12,12 +12,63 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 DB_NAME = "dorm_duty.db" # Имя файла базы данных
 DUTY_CYCLE_WEEKS = 2     # Периодичность уборки в неделях
 
+# Хранилище: "sqlite" (локальный файл DB_NAME) или "postgres" (DATABASE_URL, общий для нескольких воркеров)
+DB_BACKEND = os.getenv("DB_BACKEND", "sqlite")
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+# SQLite: все записи идут через одного писателя с групповым коммитом,
+# чтения - через пул read-only соединений (WAL)
+DB_GROUP_COMMIT_MS = 5      # Сколько ждать остальные записи, прежде чем закоммитить пачку
+DB_GROUP_COMMIT_MAX = 100   # Максимум операций записи в одной транзакции
+DB_READ_CONNECTIONS = 4     # Размер пула соединений для чтения
+DB_BUSY_TIMEOUT_MS = 5000   # Сколько SQLite ждет блокировку, прежде чем вернуть "database is locked"
+
+# PostgreSQL: пул соединений asyncpg
+DB_POOL_MIN_SIZE = 1
+DB_POOL_MAX_SIZE = 10
+DB_STATEMENT_CACHE_SIZE = 100  # Подготовленных выражений на соединение
+
+# Режим дайджеста: одно напоминание на жителя за волну вместо сообщения на каждое дежурство.
+# Если состав дежурств не изменился, бот редактирует прошлое напоминание, а не шлёт новое.
+REMINDER_DIGEST_MODE = True
+
+# Эскалация напоминаний о просрочке
+OVERDUE_REMINDER_INTERVAL_HOURS = 6  # Не чаще одного напоминания на дежурство за этот интервал
+OVERDUE_ESCALATION_STEP = 3          # Через сколько напоминаний переходить к следующему, более злому тексту
+OVERDUE_MAX_REMINDERS = 21           # Потолок: после стольких напоминаний бот перестает писать (неделя по 3 волны)
+
+# Многопроцессный режим: апдейты делятся между воркерами по chat_id,
+# задачи планировщика берут аренду в БД, чтобы каждое срабатывание выполнялось один раз
+WORKER_COUNT = int(os.getenv("WORKER_COUNT", "1"))
+JOB_LEASE_SECONDS = 600  # Срок аренды срабатывания задачи; потом ее может забрать другой воркер
+JOB_FIRE_TOLERANCE_SECONDS = 300   # Насколько запуск может отстать от срабатывания по расписанию (часы, задержка loop)
+SHARD_TAKEOVER_DELAY_SECONDS = 60  # Через сколько после волны забирать доли чатов, которые не взял их воркер
+
+# Корректная остановка (SIGTERM при передеплое, Ctrl+C): сколько ждать уже идущие
+# обработчики, задачи и досылку outbox. Docker дает 10 секунд до SIGKILL.
+SHUTDOWN_TIMEOUT_SECONDS = 8
+NOTIFICATION_CLAIM_SECONDS = 120  # На сколько воркер забирает уведомления из outbox на отправку
+
+# Кэш отрисованных ответов /schedule, /ratings, /admin_check_schedule.
+# Сбрасывается при любой записи в этом процессе; TTL ограничивает устаревание
+# из-за записей других воркеров в многопроцессном режиме.
+RENDER_CACHE_TTL_SECONDS = 60
+
+# Массовый импорт/экспорт (/admin_export, /admin_import, manage.py)
+BULK_CHUNK_SIZE = 500  # Строк на одну выборку при экспорте и на одну транзакцию при импорте
+
+# Мониторинг производительности event loop (см. /admin_perf).
+# Подменяет внутренний asyncio Handle._run на весь процесс; PERF_MONITOR_ENABLED=0 выключает
+PERF_MONITOR_ENABLED = os.getenv("PERF_MONITOR_ENABLED", "1") != "0"
+PERF_LAG_SAMPLE_INTERVAL = 0.5  # Как часто (в секундах) замерять задержку event loop
+PERF_SLOW_CALLBACK_SEC = 0.1    # Колбэки дольше этого порога считаются медленными (как slow_callback_duration в asyncio)
+
 # Имена жителей и комнат
 # ВАЖНО: Имена должны быть уникальными!
 RESIDENTS = ["Макар", "Илья", "Максим", "Павел"]
 ROOMS = ["Кухня", "Ванная", "Коридор + маленький туалет"]
 
-# Тексты для "агрессивных" уведомлений
+# Тексты для "агрессивных" уведомлений (по возрастанию уровня эскалации)
 OVERDUE_MESSAGES = [
     "🚨 **ВНИМАНИЕ!** 🚨\nТвоя очередь убирать '{room_name}' давно прошла! Пожалуйста, выполни свою обязанность. Соседи ждут!",
     "⏳ **ПРОКРАСТИНАЦИЯ ЗАШЛА СЛИШКОМ ДАЛЕКО** ⏳\nУборка комнаты '{room_name}' все еще не выполнена. Не ахуевай еблан",
@@ -0,0 +1,16 @@
+# app/db/backends/__init__.py
+from app.config import DB_BACKEND, DB_NAME, DATABASE_URL
+
+
+def create_backend(name: str = DB_BACKEND):
+    """Создает бэкенд хранилища по имени из конфига ('sqlite' или 'postgres')."""
+    if name == "sqlite":
+        from app.db.backends.sqlite import SqliteBackend
+        return SqliteBackend(DB_NAME)
+    if name == "postgres":
+        # asyncpg нужен только для этого бэкенда, поэтому импортируем лениво
+        from app.db.backends.postgres import PostgresBackend
+        if not DATABASE_URL:
+            raise ValueError("DB_BACKEND=postgres требует переменную окружения DATABASE_URL")
+        return PostgresBackend(DATABASE_URL)
+    raise ValueError(f"Неизвестный бэкенд хранилища: {name}")
@@ -0,0 +1,57 @@
+# app/db/backends/base.py
+
+
+class StorageBackend:
+    """
+    Интерфейс хранилища, через который работают функции app/db/database.py.
+
+    Запросы пишутся один раз с плейсхолдерами "?" и переносимым SQL;
+    бэкенд отвечает за соединения, транзакции, схему и диалектные мелочи.
+    Строки результатов поддерживают доступ и по имени колонки, и по индексу.
+
+    Сессия (то, что получают read() и op() в write()) умеет:
+        await session.fetchone(sql, params=())  -> строка или None
+        await session.fetchall(sql, params=())  -> список строк
+        await session.execute(sql, params=())   -> количество затронутых строк
+        await session.executemany(sql, seq_of_params)
+    """
+
+    name = None
+
+    async def initialize(self):
+        """Создает таблицы и индексы, мигрирует старую схему."""
+        raise NotImplementedError
+
+    async def lock_initialization(self, session):
+        """
+        Блокирует до конца транзакции session инициализацию из других процессов,
+        чтобы при одновременном старте воркеров первое заполнение выполнил один из них.
+        """
+        raise NotImplementedError
+
+    def read(self):
+        """Асинхронный контекстный менеджер, выдающий сессию только для чтения."""
+        raise NotImplementedError
+
+    async def write(self, op):
+        """Выполняет op(session) в транзакции и возвращает его результат."""
+        raise NotImplementedError
+
+    def group_concat(self, expr: str, separator: str) -> str:
+        """SQL-выражение агрегата, склеивающего значения expr через separator."""
+        raise NotImplementedError
+
+    def skip_locked(self) -> str:
+        """
+        Суффикс SELECT, пропускающий строки, которые сейчас забирает другая транзакция
+        (чтобы параллельные воркеры брали разные строки очереди). Пустой, если не нужен.
+        """
+        raise NotImplementedError
+
+    async def sync_id_sequence(self, session, table: str):
+        """Подтягивает автоинкремент id таблицы после вставки строк с явными id."""
+        raise NotImplementedError
+
+    async def close(self):
+        """Дожидается незавершенных записей и закрывает соединения."""
+        raise NotImplementedError
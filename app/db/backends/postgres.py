@@ -0,0 +1,207 @@
+# app/db/backends/postgres.py
+import asyncio
+import re
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+import asyncpg
+
+from app.config import DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_STATEMENT_CACHE_SIZE
+from app.db.backends.base import StorageBackend
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS residents (
+        id SERIAL PRIMARY KEY,
+        name TEXT UNIQUE NOT NULL,
+        telegram_id BIGINT UNIQUE,
+        consecutive_cleanings INTEGER DEFAULT 0,
+        last_cleaned_room_id INTEGER
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS rooms (
+        id SERIAL PRIMARY KEY,
+        name TEXT UNIQUE NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS schedule (
+        id SERIAL PRIMARY KEY,
+        resident_id INTEGER REFERENCES residents (id),
+        room_id INTEGER REFERENCES rooms (id),
+        week_start_date DATE NOT NULL,
+        is_completed BOOLEAN DEFAULT FALSE,
+        reminder_level INTEGER DEFAULT 0,
+        last_reminded_at TIMESTAMP,
+        next_reminder_at TIMESTAMP,
+        completed_at TIMESTAMP,
+        overdue_days_counted INTEGER DEFAULT 0
+    )
+    ''',
+    # ON DELETE CASCADE: SQLite не проверяет внешние ключи, и удаление смены
+    # там просто оставляет оценки-сироты, которые запросы не видят
+    '''
+    CREATE TABLE IF NOT EXISTS ratings (
+        id SERIAL PRIMARY KEY,
+        schedule_id INTEGER REFERENCES schedule (id) ON DELETE CASCADE,
+        rater_telegram_id BIGINT,
+        rating_value INTEGER
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS reminder_messages (
+        telegram_id BIGINT NOT NULL,
+        kind TEXT NOT NULL,
+        message_id BIGINT NOT NULL,
+        duty_key TEXT NOT NULL,
+        PRIMARY KEY (telegram_id, kind)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS job_leases (
+        lease_key TEXT PRIMARY KEY,
+        holder TEXT NOT NULL,
+        expires_at TIMESTAMP NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS outbox (
+        id SERIAL PRIMARY KEY,
+        dedup_key TEXT UNIQUE NOT NULL,
+        kind TEXT NOT NULL,
+        telegram_id BIGINT NOT NULL,
+        schedule_id INTEGER,
+        created_at TIMESTAMP NOT NULL,
+        claimed_by TEXT,
+        claimed_until TIMESTAMP,
+        sent_at TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS weekly_rollups (
+        week_start DATE NOT NULL,
+        resident_id INTEGER NOT NULL,
+        room_id INTEGER NOT NULL,
+        assigned INTEGER DEFAULT 0,
+        completed INTEGER DEFAULT 0,
+        timed_completions INTEGER DEFAULT 0,
+        completion_seconds BIGINT DEFAULT 0,
+        overdue_days INTEGER DEFAULT 0,
+        ratings_count INTEGER DEFAULT 0,
+        ratings_sum INTEGER DEFAULT 0,
+        rating_1 INTEGER DEFAULT 0,
+        rating_2 INTEGER DEFAULT 0,
+        rating_3 INTEGER DEFAULT 0,
+        rating_4 INTEGER DEFAULT 0,
+        rating_5 INTEGER DEFAULT 0,
+        PRIMARY KEY (week_start, resident_id, room_id)
+    )
+    ''',
+    # Колонки, добавленные после появления бэкенда
+    "ALTER TABLE schedule ADD COLUMN IF NOT EXISTS completed_at TIMESTAMP",
+    "ALTER TABLE schedule ADD COLUMN IF NOT EXISTS overdue_days_counted INTEGER DEFAULT 0",
+    "CREATE INDEX IF NOT EXISTS idx_schedule_next_reminder ON schedule (next_reminder_at)",
+    "CREATE INDEX IF NOT EXISTS idx_rollups_resident ON weekly_rollups (resident_id, week_start)",
+    "CREATE INDEX IF NOT EXISTS idx_outbox_sent ON outbox (sent_at)",
+    "CREATE INDEX IF NOT EXISTS idx_schedule_open ON schedule (is_completed, week_start_date)",
+]
+
+# Ключ advisory-блокировки, чтобы несколько воркеров не создавали и не заполняли схему одновременно
+_SCHEMA_LOCK_KEY = 0x64757479
+
+
+@lru_cache(maxsize=None)
+def _to_pg(sql: str) -> str:
+    """Переводит плейсхолдеры "?" в нумерованные $1, $2, ... asyncpg."""
+    counter = iter(range(1, sql.count("?") + 1))
+    return re.sub(r"\?", lambda _: f"${next(counter)}", sql)
+
+
+class PostgresSession:
+    """Сессия поверх соединения asyncpg."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    async def fetchone(self, sql, params=()):
+        return await self._conn.fetchrow(_to_pg(sql), *params)
+
+    async def fetchall(self, sql, params=()):
+        return await self._conn.fetch(_to_pg(sql), *params)
+
+    async def execute(self, sql, params=()):
+        # asyncpg возвращает статус вида "DELETE 3" - последнее число и есть rowcount
+        status = await self._conn.execute(_to_pg(sql), *params)
+        count = status.rsplit(" ", 1)[-1]
+        return int(count) if count.isdigit() else 0
+
+    async def executemany(self, sql, seq_of_params):
+        await self._conn.executemany(_to_pg(sql), list(seq_of_params))
+
+
+class PostgresBackend(StorageBackend):
+    """
+    PostgreSQL через пул соединений asyncpg, общий для нескольких воркеров бота.
+    asyncpg готовит запросы на сервере и кэширует подготовленные выражения
+    на каждом соединении (DB_STATEMENT_CACHE_SIZE), так что повторные запросы не парсятся заново.
+    """
+
+    name = "postgres"
+
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self._pool = None
+        # Первые запросы приходят параллельно - пул должен создать только один из них
+        self._pool_lock = asyncio.Lock()
+
+    async def _get_pool(self):
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    self._pool = await asyncpg.create_pool(
+                        self.dsn,
+                        min_size=DB_POOL_MIN_SIZE,
+                        max_size=DB_POOL_MAX_SIZE,
+                        statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+                    )
+        return self._pool
+
+    async def initialize(self):
+        async def op(db):
+            await self.lock_initialization(db)
+            for ddl in SCHEMA:
+                await db.execute(ddl)
+        await self.write(op)
+
+    async def lock_initialization(self, session):
+        await session.execute("SELECT pg_advisory_xact_lock(?)", (_SCHEMA_LOCK_KEY,))
+
+    def group_concat(self, expr, separator):
+        return f"STRING_AGG(CAST({expr} AS TEXT), {separator})"
+
+    def skip_locked(self):
+        return "FOR UPDATE SKIP LOCKED"
+
+    async def sync_id_sequence(self, session, table):
+        # Вставка с явными id не двигает последовательность SERIAL
+        await session.execute(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+        )
+
+    @asynccontextmanager
+    async def read(self):
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            yield PostgresSession(conn)
+
+    async def write(self, op):
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                return await op(PostgresSession(conn))
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
@@ -0,0 +1,304 @@
+# app/db/backends/sqlite.py
+import asyncio
+import logging
+import sqlite3
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+
+import aiosqlite
+
+from app.config import DB_GROUP_COMMIT_MS, DB_GROUP_COMMIT_MAX, DB_READ_CONNECTIONS, DB_BUSY_TIMEOUT_MS
+from app.db.backends.base import StorageBackend
+
+# Явные адаптеры вместо устаревших встроенных: даты хранятся строками ISO,
+# поэтому сравнения в запросах работают лексикографически
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" ", "seconds"))
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS residents (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE NOT NULL,
+        telegram_id INTEGER UNIQUE,
+        consecutive_cleanings INTEGER DEFAULT 0,
+        last_cleaned_room_id INTEGER
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS rooms (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS schedule (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        resident_id INTEGER,
+        room_id INTEGER,
+        week_start_date DATE NOT NULL,
+        is_completed BOOLEAN DEFAULT FALSE,
+        reminder_level INTEGER DEFAULT 0,
+        last_reminded_at TIMESTAMP,
+        next_reminder_at TIMESTAMP,
+        completed_at TIMESTAMP,
+        overdue_days_counted INTEGER DEFAULT 0,
+        FOREIGN KEY (resident_id) REFERENCES residents (id),
+        FOREIGN KEY (room_id) REFERENCES rooms (id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS ratings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        schedule_id INTEGER,
+        rater_telegram_id INTEGER,
+        rating_value INTEGER,
+        FOREIGN KEY (schedule_id) REFERENCES schedule (id)
+    )
+    ''',
+    # Последнее напоминание каждого вида, отправленное жителю (для режима дайджеста)
+    '''
+    CREATE TABLE IF NOT EXISTS reminder_messages (
+        telegram_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        message_id INTEGER NOT NULL,
+        duty_key TEXT NOT NULL,
+        PRIMARY KEY (telegram_id, kind)
+    )
+    ''',
+    # Аренды срабатываний задач планировщика (многопроцессный режим)
+    '''
+    CREATE TABLE IF NOT EXISTS job_leases (
+        lease_key TEXT PRIMARY KEY,
+        holder TEXT NOT NULL,
+        expires_at TIMESTAMP NOT NULL
+    )
+    ''',
+    # Исходящие уведомления: ставятся в той же транзакции, что и породившая их запись,
+    # и помечаются отправленными по одному, так что прерванная рассылка дошлется без дублей
+    '''
+    CREATE TABLE IF NOT EXISTS outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        dedup_key TEXT UNIQUE NOT NULL,
+        kind TEXT NOT NULL,
+        telegram_id INTEGER NOT NULL,
+        schedule_id INTEGER,
+        created_at TIMESTAMP NOT NULL,
+        claimed_by TEXT,
+        claimed_until TIMESTAMP,
+        sent_at TIMESTAMP
+    )
+    ''',
+    # Недельные сводки для аналитики (/stats, /admin_stats), обновляются при каждой записи
+    '''
+    CREATE TABLE IF NOT EXISTS weekly_rollups (
+        week_start DATE NOT NULL,
+        resident_id INTEGER NOT NULL,
+        room_id INTEGER NOT NULL,
+        assigned INTEGER DEFAULT 0,
+        completed INTEGER DEFAULT 0,
+        timed_completions INTEGER DEFAULT 0,
+        completion_seconds INTEGER DEFAULT 0,
+        overdue_days INTEGER DEFAULT 0,
+        ratings_count INTEGER DEFAULT 0,
+        ratings_sum INTEGER DEFAULT 0,
+        rating_1 INTEGER DEFAULT 0,
+        rating_2 INTEGER DEFAULT 0,
+        rating_3 INTEGER DEFAULT 0,
+        rating_4 INTEGER DEFAULT 0,
+        rating_5 INTEGER DEFAULT 0,
+        PRIMARY KEY (week_start, resident_id, room_id)
+    )
+    ''',
+]
+
+# Колонки, добавленные после первых версий схемы: (таблица, колонка, тип)
+MIGRATIONS = [
+    ("schedule", "reminder_level", "INTEGER DEFAULT 0"),
+    ("schedule", "last_reminded_at", "TIMESTAMP"),
+    ("schedule", "next_reminder_at", "TIMESTAMP"),
+    ("schedule", "completed_at", "TIMESTAMP"),
+    ("schedule", "overdue_days_counted", "INTEGER DEFAULT 0"),
+]
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_schedule_next_reminder ON schedule (next_reminder_at)",
+    "CREATE INDEX IF NOT EXISTS idx_rollups_resident ON weekly_rollups (resident_id, week_start)",
+    "CREATE INDEX IF NOT EXISTS idx_outbox_sent ON outbox (sent_at)",
+    "CREATE INDEX IF NOT EXISTS idx_schedule_open ON schedule (is_completed, week_start_date)",
+]
+
+
+class SqliteSession:
+    """Сессия поверх соединения aiosqlite."""
+
+    def __init__(self, db):
+        self._db = db
+
+    async def fetchone(self, sql, params=()):
+        async with self._db.execute(sql, params) as cursor:
+            return await cursor.fetchone()
+
+    async def fetchall(self, sql, params=()):
+        async with self._db.execute(sql, params) as cursor:
+            return await cursor.fetchall()
+
+    async def execute(self, sql, params=()):
+        async with self._db.execute(sql, params) as cursor:
+            return cursor.rowcount
+
+    async def executemany(self, sql, seq_of_params):
+        await self._db.executemany(sql, seq_of_params)
+
+
+class SqliteBackend(StorageBackend):
+    """
+    Локальный файл SQLite.
+
+    Все записи выполняет единственный писатель: он собирает операции, пришедшие
+    за DB_GROUP_COMMIT_MS, в одну транзакцию (каждая в своем SAVEPOINT, чтобы ошибка
+    одной не откатывала остальные) и возвращает результат каждому через future.
+    Чтения идут через отдельные read-only соединения и в режиме WAL не ждут писателя.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        self._write_queue = None
+        self._writer_task = None
+        self._read_pool = None
+
+    async def initialize(self):
+        async def op(db):
+            for ddl in SCHEMA:
+                await db.execute(ddl)
+            # Миграция старых баз
+            for table, column, column_type in MIGRATIONS:
+                columns = {row[1] for row in await db.fetchall(f"PRAGMA table_info({table})")}
+                if column not in columns:
+                    await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+            await db.execute("""
+                UPDATE schedule SET next_reminder_at = datetime(week_start_date, '+7 days')
+                WHERE is_completed = FALSE AND next_reminder_at IS NULL AND reminder_level = 0
+            """)
+            for ddl in INDEXES:
+                await db.execute(ddl)
+        await self.write(op)
+
+    async def lock_initialization(self, session):
+        # Писатель один, транзакции записи и так идут по очереди
+        pass
+
+    def group_concat(self, expr, separator):
+        return f"GROUP_CONCAT({expr}, {separator})"
+
+    def skip_locked(self):
+        # Писатель один, транзакции записи и так идут по очереди
+        return ""
+
+    async def sync_id_sequence(self, session, table):
+        # AUTOINCREMENT в SQLite сам учитывает максимальный вставленный id
+        pass
+
+    async def write(self, op):
+        """Ставит операцию записи в очередь писателя и ждет ее результата."""
+        if self._writer_task is None or self._writer_task.done():
+            self._write_queue = asyncio.Queue()
+            self._writer_task = asyncio.create_task(self._writer_loop(self._write_queue))
+        future = asyncio.get_running_loop().create_future()
+        await self._write_queue.put((op, future))
+        return await future
+
+    async def _writer_loop(self, queue):
+        db = None
+        try:
+            # isolation_level=None: транзакциями управляем сами (BEGIN/SAVEPOINT/COMMIT)
+            db = await aiosqlite.connect(self.path, isolation_level=None)
+            db.row_factory = aiosqlite.Row
+            await db.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+            await db.execute("PRAGMA journal_mode = WAL")
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                batch = [item]
+                await asyncio.sleep(DB_GROUP_COMMIT_MS / 1000)
+                while len(batch) < DB_GROUP_COMMIT_MAX and not queue.empty():
+                    item = queue.get_nowait()
+                    if item is None:
+                        queue.put_nowait(None)  # Остановимся после этой пачки
+                        break
+                    batch.append(item)
+                await self._commit_batch(db, batch)
+        except Exception as e:
+            # Писатель упал (например, не открылась БД) - не оставляем вызывающих ждать вечно
+            logging.error(f"Писатель БД остановлен из-за ошибки: {e}")
+            while not queue.empty():
+                item = queue.get_nowait()
+                if item is not None and not item[1].done():
+                    item[1].set_exception(e)
+            raise
+        finally:
+            if db is not None:
+                await db.close()
+
+    async def _commit_batch(self, db, batch):
+        """Выполняет пачку операций записи в одной транзакции и раздает результаты."""
+        session = SqliteSession(db)
+        results = []
+        try:
+            await db.execute("BEGIN IMMEDIATE")
+            for op, future in batch:
+                await db.execute("SAVEPOINT write_op")
+                try:
+                    result = await op(session)
+                except Exception as e:
+                    await db.execute("ROLLBACK TO write_op")
+                    results.append((future, None, e))
+                else:
+                    results.append((future, result, None))
+                await db.execute("RELEASE write_op")
+            await db.execute("COMMIT")
+        except Exception as e:
+            logging.error(f"Не удалось закоммитить пачку из {len(batch)} записей: {e}")
+            if db.in_transaction:
+                await db.execute("ROLLBACK")
+            results = [(future, None, e) for _, future in batch]
+
+        for future, result, error in results:
+            if future.done():  # Вызывающий мог быть отменен
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    @asynccontextmanager
+    async def read(self):
+        """Выдает read-only соединение из пула (соединения открываются лениво)."""
+        if self._read_pool is None:
+            self._read_pool = asyncio.Queue()
+            for _ in range(DB_READ_CONNECTIONS):
+                self._read_pool.put_nowait(None)
+        db = await self._read_pool.get()
+        try:
+            if db is None:
+                db = await aiosqlite.connect(f"file:{self.path}?mode=ro", uri=True)
+                db.row_factory = aiosqlite.Row
+                await db.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+            yield SqliteSession(db)
+        finally:
+            self._read_pool.put_nowait(db)
+
+    async def close(self):
+        if self._writer_task is not None and not self._writer_task.done():
+            await self._write_queue.put(None)
+            await self._writer_task
+        self._writer_task = None
+        if self._read_pool is not None:
+            while not self._read_pool.empty():
+                db = self._read_pool.get_nowait()
+                if db is not None:
+                    await db.close()
+            self._read_pool = None
@@ -1,83 +1,106 @@
 # app/db/database.py
-import aiosqlite
-from datetime import date
-from app.config import DB_NAME, RESIDENTS, ROOMS
+from datetime import date, datetime, time, timedelta, timezone
+from app.config import RESIDENTS, ROOMS, OVERDUE_REMINDER_INTERVAL_HOURS, OVERDUE_MAX_REMINDERS, BULK_CHUNK_SIZE
+from app.db.backends import create_backend
+
+# Разделитель для склейки в запросах дайджеста (в названиях комнат не встречается)
+DIGEST_SEPARATOR = "|"
+
+# Хранилище выбирается в конфиге (DB_BACKEND): SQLite по умолчанию или PostgreSQL.
+# Запросы ниже пишутся один раз на переносимом SQL с плейсхолдерами "?",
+# даты и время передаются параметрами, а не считаются функциями конкретной СУБД.
+_backend = create_backend()
+
+# Версия данных: увеличивается после каждой записи в жителей, комнаты, расписание,
+# оценки или сводки. По ней кэш отрисовки (app/utils/rendering.py) понимает, что
+# закэшированные ответы устарели. Служебные записи (outbox, аренды, сообщения
+# напоминаний) на ответы не влияют и версию не трогают.
+_data_version = 0
+
+def get_data_version():
+    return _data_version
+
+async def _write(op, changes_data=True):
+    """
+    Выполняет операцию записи через бэкенд и увеличивает версию данных.
+    changes_data=False - служебная запись, которая не меняет отрисовываемые данные.
+    """
+    global _data_version
+    try:
+        return await _backend.write(op)
+    finally:
+        # Даже при ошибке часть пачки могла закоммититься - перестраховываемся
+        if changes_data:
+            _data_version += 1
+
+def _as_date(value):
+    """SQLite возвращает даты строками 'YYYY-MM-DD', PostgreSQL - объектами date."""
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+def _as_datetime(value):
+    """То же для отметок времени: строка 'YYYY-MM-DD HH:MM:SS' в SQLite, datetime в PostgreSQL."""
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+def _utcnow():
+    """Текущее время UTC без таймзоны - в таком виде хранятся отметки напоминаний."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _current_shift_bounds():
+    """Смена длится 7 дней: она текущая, если week_start_date в [сегодня - 6 дней, сегодня]."""
+    today = date.today()
+    return today - timedelta(days=6), today
 
 async def initialize_db():
     """Инициализирует базу данных, создает таблицы и заполняет их."""
-    async with aiosqlite.connect(DB_NAME) as db:
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS residents (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL,
-                telegram_id INTEGER UNIQUE,
-                consecutive_cleanings INTEGER DEFAULT 0,
-                last_cleaned_room_id INTEGER
-            )
-        ''')
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS rooms (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL
-            )
-        ''')
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS schedule (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                resident_id INTEGER,
-                room_id INTEGER,
-                week_start_date DATE NOT NULL,
-                is_completed BOOLEAN DEFAULT FALSE,
-                FOREIGN KEY (resident_id) REFERENCES residents (id),
-                FOREIGN KEY (room_id) REFERENCES rooms (id)
-            )
-        ''')
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS ratings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                schedule_id INTEGER,
-                rater_telegram_id INTEGER,
-                rating_value INTEGER,
-                FOREIGN KEY (schedule_id) REFERENCES schedule (id)
-            )
-        ''')
+    await _backend.initialize()
 
+    async def op(db):
+        # Под блокировкой до конца транзакции: иначе воркеры, стартовавшие вместе, каждый
+        # увидят пустые сводки и построят их заново поверх друг друга (счетчики удвоятся)
+        await _backend.lock_initialization(db)
         # Заполняем таблицы жителей и комнат, если они пусты
-        await db.executemany("INSERT OR IGNORE INTO residents (name) VALUES (?)", [(name,) for name in RESIDENTS])
-        await db.executemany("INSERT OR IGNORE INTO rooms (name) VALUES (?)", [(name,) for name in ROOMS])
-        await db.commit()
+        await db.executemany("INSERT INTO residents (name) VALUES (?) ON CONFLICT (name) DO NOTHING", [(name,) for name in RESIDENTS])
+        await db.executemany("INSERT INTO rooms (name) VALUES (?) ON CONFLICT (name) DO NOTHING", [(name,) for name in ROOMS])
+        # Первый запуск с аналитикой: строим сводки по уже накопленной истории
+        has_rollups = await db.fetchone("SELECT 1 FROM weekly_rollups LIMIT 1")
+        if not has_rollups:
+            await _rebuild_rollups(db)
+    return await _write(op)
+
+async def close_db():
+    """Дожидается записи всех операций из очереди и закрывает соединения."""
+    await _backend.close()
 
 # --- Функции для регистрации ---
 async def get_resident_by_name(name):
-    async with aiosqlite.connect(DB_NAME) as db:
-        cursor = await db.execute("SELECT * FROM residents WHERE name = ? COLLATE NOCASE", (name,))
-        return await cursor.fetchone()
+    async with _backend.read() as db:
+        return await db.fetchone("SELECT * FROM residents WHERE LOWER(name) = LOWER(?)", (name,))
 async def get_room_by_name(name):
     """Находит комнату по имени (без учета регистра)."""
-    async with aiosqlite.connect(DB_NAME) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("SELECT * FROM rooms WHERE name = ? COLLATE NOCASE", (name,))
-        return await cursor.fetchone()
+    async with _backend.read() as db:
+        return await db.fetchone("SELECT * FROM rooms WHERE LOWER(name) = LOWER(?)", (name,))
 
 async def get_latest_schedule_date():
     """Возвращает самую последнюю дату начала смены (week_start_date) из расписания."""
-    async with aiosqlite.connect(DB_NAME) as db:
-        cursor = await db.execute("SELECT MAX(week_start_date) FROM schedule")
-        result = await cursor.fetchone()
+    async with _backend.read() as db:
+        result = await db.fetchone("SELECT MAX(week_start_date) FROM schedule")
         if result and result[0]:
-            # aiosqlite возвращает дату как строку 'YYYY-MM-DD'
-            return date.fromisoformat(result[0])
+            return _as_date(result[0])
         return None # Возвращаем None, если расписаний нет
 
 async def set_resident_cleaning_stats(resident_id, room_id):
     """Обновляет статистику для ОДНОГО жителя (для ручного назначения)."""
-    async with aiosqlite.connect(DB_NAME) as db:
+    async def op(db):
         await db.execute("""
             UPDATE residents 
             SET consecutive_cleanings = consecutive_cleanings + 1, last_cleaned_room_id = ?
             WHERE id = ?
         """, (room_id, resident_id))
-        await db.commit()
+    return await _write(op)
 
 async def clear_latest_uncompleted_schedule():
     """
@@ -85,10 +108,9 @@ async def clear_latest_uncompleted_schedule():
     для самой последней смены (по MAX(week_start_date)).
     Возвращает количество удаленных записей.
     """
-    async with aiosqlite.connect(DB_NAME) as db:
+    async def op(db):
         # 1. Находим последнюю дату
-        cursor = await db.execute("SELECT MAX(week_start_date) FROM schedule")
-        latest_date_tuple = await cursor.fetchone()
+        latest_date_tuple = await db.fetchone("SELECT MAX(week_start_date) FROM schedule")
         
         if not latest_date_tuple or not latest_date_tuple[0]:
             return 0 # Таблица пуста
@@ -96,31 +118,35 @@ async def clear_latest_uncompleted_schedule():
         latest_date = latest_date_tuple[0]
         
         # 2. Удаляем незавершенные записи для этой даты
-        cursor = await db.execute(
+        deleted = await db.execute(
             "DELETE FROM schedule WHERE week_start_date = ? AND is_completed = FALSE",
             (latest_date,)
         )
-        await db.commit()
-        return cursor.rowcount
+        await _rebuild_rollups(db, [latest_date])
+        return deleted
+    return await _write(op)
+
+async def _delete_schedule(db, date_to_delete):
+    await db.execute("DELETE FROM schedule WHERE week_start_date = ?", (_as_date(date_to_delete),))
+    await _rebuild_rollups(db, [date_to_delete])
 
 async def delete_schedule_by_date(date_to_delete):
     """
     (ДЛЯ ИСПРАВЛЕНИЯ /admin_force_assignment)
     Удаляет ВСЕ записи (выполненные и нет) для КОНКРЕТНОЙ даты.
     """
-    async with aiosqlite.connect(DB_NAME) as db:
-        await db.execute("DELETE FROM schedule WHERE week_start_date = ?", (date_to_delete,))
-        await db.commit()
+    async def op(db):
+        await _delete_schedule(db, date_to_delete)
+    return await _write(op)
 
 async def register_user(resident_id, telegram_id):
-    async with aiosqlite.connect(DB_NAME) as db:
+    async def op(db):
         await db.execute("UPDATE residents SET telegram_id = ? WHERE id = ?", (telegram_id, resident_id))
-        await db.commit()
+    return await _write(op)
 
 async def get_resident_by_tg_id(telegram_id):
-    async with aiosqlite.connect(DB_NAME) as db:
-        cursor = await db.execute("SELECT * FROM residents WHERE telegram_id = ?", (telegram_id,))
-        return await cursor.fetchone()
+    async with _backend.read() as db:
+        return await db.fetchone("SELECT * FROM residents WHERE telegram_id = ?", (telegram_id,))
 
 # --- Функции для планировщика ---
 async def get_cleaning_candidates():
@@ -130,141 +156,404 @@ async def get_cleaning_candidates():
     Это гарантирует, что мы всегда получим кандидатов,
     если жители вообще есть в БД.
     """
-    async with aiosqlite.connect(DB_NAME) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("SELECT * FROM residents ORDER BY consecutive_cleanings ASC, RANDOM()")
-        return await cursor.fetchall()
+    async with _backend.read() as db:
+        return await db.fetchall("SELECT * FROM residents ORDER BY consecutive_cleanings ASC, RANDOM()")
 
 async def get_all_rooms():
-    async with aiosqlite.connect(DB_NAME) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("SELECT * FROM rooms")
-        return await cursor.fetchall()
+    async with _backend.read() as db:
+        return await db.fetchall("SELECT * FROM rooms")
+
+async def _insert_schedule_entry(db, resident_id, room_id, week_start_date):
+    week_start_date = _as_date(week_start_date)
+    # Первое напоминание о просрочке - сразу после окончания смены
+    first_overdue_reminder = datetime.combine(week_start_date, time()) + timedelta(days=7)
+    row = await db.fetchone(
+        "INSERT INTO schedule (resident_id, room_id, week_start_date, next_reminder_at) VALUES (?, ?, ?, ?) RETURNING id",
+        (resident_id, room_id, week_start_date, first_overdue_reminder)
+    )
+    await _add_to_rollup(db, week_start_date, resident_id, room_id, assigned=1)
+    return row[0]
 
 async def add_schedule_entry(resident_id, room_id, week_start_date):
     """Добавляет одну запись о дежурстве в БД и возвращает её ID."""
-    async with aiosqlite.connect(DB_NAME) as db:
-        cursor = await db.execute(
-            "INSERT INTO schedule (resident_id, room_id, week_start_date) VALUES (?, ?, ?)",
-            (resident_id, room_id, week_start_date)
-        )
-        await db.commit()
-        return cursor.lastrowid
+    async def op(db):
+        return await _insert_schedule_entry(db, resident_id, room_id, week_start_date)
+    return await _write(op)
+
+async def _update_cleaning_stats(db, assigned_id_pairs, all_resident_ids):
+    assigned_ids = {res_id for res_id, room_id in assigned_id_pairs}
+    unassigned_ids = set(all_resident_ids) - assigned_ids
+
+    for res_id in unassigned_ids:
+        await db.execute("UPDATE residents SET consecutive_cleanings = 0 WHERE id = ?", (res_id,))
+    
+    for res_id, room_id in assigned_id_pairs:
+        await db.execute("""
+            UPDATE residents 
+            SET consecutive_cleanings = consecutive_cleanings + 1, last_cleaned_room_id = ?
+            WHERE id = ?
+        """, (room_id, res_id))
 
 async def update_resident_cleaning_stats(assigned_id_pairs, all_resident_ids):
     """Обновляет статистику уборок для всех жителей."""
-    async with aiosqlite.connect(DB_NAME) as db:
-        assigned_ids = {res_id for res_id, room_id in assigned_id_pairs}
-        unassigned_ids = set(all_resident_ids) - assigned_ids
+    async def op(db):
+        await _update_cleaning_stats(db, assigned_id_pairs, all_resident_ids)
+    return await _write(op)
 
-        for res_id in unassigned_ids:
-            await db.execute("UPDATE residents SET consecutive_cleanings = 0 WHERE id = ?", (res_id,))
-        
-        for res_id, room_id in assigned_id_pairs:
-            await db.execute("""
-                UPDATE residents 
-                SET consecutive_cleanings = consecutive_cleanings + 1, last_cleaned_room_id = ?
-                WHERE id = ?
-            """, (room_id, res_id))
-        await db.commit()
+async def replace_schedule(week_start_date, assignments, all_resident_ids):
+    """
+    Пересоздает смену одной транзакцией: удаляет записи за week_start_date, добавляет
+    назначения, обновляет статистику жителей и ставит уведомления о дежурстве в outbox.
+    Остановка бота посреди назначения не оставит полсмены без уведомлений.
+    assignments - список (resident_id, room_id, telegram_id или None).
+    Возвращает ID новых записей в порядке assignments.
+    """
+    async def op(db):
+        await _delete_schedule(db, week_start_date)
+        schedule_ids = []
+        for resident_id, room_id, telegram_id in assignments:
+            schedule_id = await _insert_schedule_entry(db, resident_id, room_id, week_start_date)
+            if telegram_id:
+                await _enqueue_notification(db, "assignment", telegram_id, schedule_id)
+            schedule_ids.append(schedule_id)
+        await _update_cleaning_stats(db, [(res_id, room_id) for res_id, room_id, _ in assignments], all_resident_ids)
+        return schedule_ids
+    return await _write(op)
 
 async def get_all_resident_ids():
     """Возвращает ID всех жителей."""
-    async with aiosqlite.connect(DB_NAME) as db:
-        cursor = await db.execute("SELECT id FROM residents")
-        rows = await cursor.fetchall()
+    async with _backend.read() as db:
+        rows = await db.fetchall("SELECT id FROM residents")
         return [row[0] for row in rows]
 
 async def is_schedule_empty():
     """Проверяет, пуста ли таблица с расписаниями."""
-    async with aiosqlite.connect(DB_NAME) as db:
-        cursor = await db.execute("SELECT COUNT(id) FROM schedule")
-        count = await cursor.fetchone()
+    async with _backend.read() as db:
+        count = await db.fetchone("SELECT COUNT(id) FROM schedule")
         return count[0] == 0
 
 # --- Функции для уведомлений ---
 async def get_uncompleted_duties_for_today():
-    async with aiosqlite.connect(DB_NAME) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("""
+    async with _backend.read() as db:
+        return await db.fetchall("""
             SELECT s.id, r.name as resident_name, rm.name as room_name, r.telegram_id
             FROM schedule s
             JOIN residents r ON s.resident_id = r.id
             JOIN rooms rm ON s.room_id = rm.id
-            WHERE s.is_completed = FALSE AND date('now') >= s.week_start_date AND date('now') <= date(s.week_start_date, '+6 days')
-        """)
-        return await cursor.fetchall()
+            WHERE s.is_completed = FALSE AND s.week_start_date >= ? AND s.week_start_date <= ?
+        """, _current_shift_bounds())
 
 async def get_overdue_duties():
-    async with aiosqlite.connect(DB_NAME) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("""
-            SELECT s.id, r.name as resident_name, rm.name as room_name, r.telegram_id
+    """
+    Просроченные дежурства, по которым пора напомнить (next_reminder_at наступил).
+    Идет по индексу idx_schedule_next_reminder, а не по всей истории просрочек.
+    """
+    async with _backend.read() as db:
+        return await db.fetchall("""
+            SELECT s.id, r.name as resident_name, rm.name as room_name, r.telegram_id, s.reminder_level
             FROM schedule s
             JOIN residents r ON s.resident_id = r.id
             JOIN rooms rm ON s.room_id = rm.id
-            WHERE s.is_completed = FALSE AND date('now') > date(s.week_start_date, '+6 days')
-        """)
-        return await cursor.fetchall()
+            WHERE s.next_reminder_at <= ? AND s.is_completed = FALSE
+        """, (_utcnow(),))
+
+async def get_uncompleted_duties_digest():
+    """
+    То же, что get_uncompleted_duties_for_today, но сгруппированное по жителю:
+    одна строка на telegram_id со списками schedule_ids и room_names.
+    """
+    async with _backend.read() as db:
+        return await db.fetchall(f"""
+            SELECT r.telegram_id, MAX(r.name) as resident_name,
+                   {_backend.group_concat("s.id", "','")} as schedule_ids,
+                   {_backend.group_concat("rm.name", "?")} as room_names
+            FROM schedule s
+            JOIN residents r ON s.resident_id = r.id
+            JOIN rooms rm ON s.room_id = rm.id
+            WHERE s.is_completed = FALSE AND r.telegram_id IS NOT NULL
+            AND s.week_start_date >= ? AND s.week_start_date <= ?
+            GROUP BY r.telegram_id
+        """, (DIGEST_SEPARATOR, *_current_shift_bounds()))
+
+async def get_overdue_duties_digest():
+    """Просроченные дежурства, по которым пора напомнить, сгруппированные по жителю (см. get_overdue_duties)."""
+    async with _backend.read() as db:
+        return await db.fetchall(f"""
+            SELECT r.telegram_id, MAX(r.name) as resident_name,
+                   {_backend.group_concat("s.id", "','")} as schedule_ids,
+                   {_backend.group_concat("rm.name", "?")} as room_names,
+                   MAX(s.reminder_level) as reminder_level
+            FROM schedule s
+            JOIN residents r ON s.resident_id = r.id
+            JOIN rooms rm ON s.room_id = rm.id
+            WHERE s.next_reminder_at <= ? AND s.is_completed = FALSE
+            AND r.telegram_id IS NOT NULL
+            GROUP BY r.telegram_id
+        """, (DIGEST_SEPARATOR, _utcnow()))
+
+async def get_reminder_message(telegram_id, kind):
+    """Возвращает последнее напоминание вида kind ('reminder'/'overdue') для жителя."""
+    async with _backend.read() as db:
+        return await db.fetchone(
+            "SELECT message_id, duty_key FROM reminder_messages WHERE telegram_id = ? AND kind = ?",
+            (telegram_id, kind)
+        )
+
+async def save_reminder_message(telegram_id, kind, message_id, duty_key):
+    """Запоминает message_id отправленного напоминания, чтобы в следующий раз его отредактировать."""
+    async def op(db):
+        await db.execute("""
+            INSERT INTO reminder_messages (telegram_id, kind, message_id, duty_key) VALUES (?, ?, ?, ?)
+            ON CONFLICT (telegram_id, kind) DO UPDATE SET message_id = excluded.message_id, duty_key = excluded.duty_key
+        """, (telegram_id, kind, message_id, duty_key))
+    return await _write(op, changes_data=False)
         
+async def mark_overdue_reminded(schedule_ids):
+    """
+    Повышает уровень эскалации после отправленного напоминания о просрочке
+    и назначает следующее. По достижении OVERDUE_MAX_REMINDERS напоминания прекращаются.
+    """
+    now = _utcnow()
+    # Запас в 5 минут, чтобы волна ровно через интервал не пропустила дежурство из-за секунд
+    next_reminder_at = now + timedelta(hours=OVERDUE_REMINDER_INTERVAL_HOURS, minutes=-5)
+    async def op(db):
+        await db.executemany("""
+            UPDATE schedule
+            SET reminder_level = reminder_level + 1, last_reminded_at = ?, next_reminder_at = ?
+            WHERE id = ?
+        """, [(now, next_reminder_at, schedule_id) for schedule_id in schedule_ids])
+        await db.executemany(
+            "UPDATE schedule SET next_reminder_at = NULL WHERE id = ? AND reminder_level >= ?",
+            [(schedule_id, OVERDUE_MAX_REMINDERS) for schedule_id in schedule_ids]
+        )
+    return await _write(op)
+
 # --- Функции для колбэков ---
 async def complete_duty(schedule_id):
-    async with aiosqlite.connect(DB_NAME) as db:
-        await db.execute("UPDATE schedule SET is_completed = TRUE WHERE id = ?", (schedule_id,))
-        await db.commit()
+    """
+    Отмечает дежурство выполненным и ставит в outbox просьбы оценить уборку
+    всем остальным зарегистрированным жителям. Возвращает id этих уведомлений
+    (пустой список, если дежурство уже было выполнено).
+    """
+    completed_at = _utcnow()
+    async def op(db):
+        # Повторное нажатие кнопки не должно второй раз попасть в сводки и рассылку
+        duty = await db.fetchone("""
+            UPDATE schedule SET is_completed = TRUE, next_reminder_at = NULL, completed_at = ?
+            WHERE id = ? AND is_completed = FALSE
+            RETURNING week_start_date, resident_id, room_id, overdue_days_counted
+        """, (completed_at, schedule_id))
+        if not duty:
+            return []
+        await _add_to_rollup(db, duty[0], duty[1], duty[2], **_completion_deltas(duty[0], completed_at, duty[3]))
+
+        raters = await db.fetchall(
+            "SELECT telegram_id FROM residents WHERE telegram_id IS NOT NULL AND id != ?", (duty[1],)
+        )
+        notification_ids = []
+        for rater in raters:
+            notification_id = await _enqueue_notification(db, "rating_request", rater[0], schedule_id)
+            if notification_id:
+                notification_ids.append(notification_id)
+        return notification_ids
+    return await _write(op)
         
 async def get_duty_details_for_rating(schedule_id):
-    async with aiosqlite.connect(DB_NAME) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("""
+    async with _backend.read() as db:
+        return await db.fetchone("""
             SELECT s.id, r.telegram_id as cleaner_tg_id, rm.name as room_name
             FROM schedule s
             JOIN residents r ON s.resident_id = r.id
             JOIN rooms rm ON s.room_id = rm.id
             WHERE s.id = ?
         """, (schedule_id,))
-        return await cursor.fetchone()
 
 async def get_all_residents_for_rating():
-    async with aiosqlite.connect(DB_NAME) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("SELECT telegram_id FROM residents WHERE telegram_id IS NOT NULL")
-        return await cursor.fetchall()
+    async with _backend.read() as db:
+        return await db.fetchall("SELECT telegram_id FROM residents WHERE telegram_id IS NOT NULL")
 
 async def save_rating(schedule_id, rater_telegram_id, rating):
-     async with aiosqlite.connect(DB_NAME) as db:
+    async def op(db):
         await db.execute(
             "INSERT INTO ratings (schedule_id, rater_telegram_id, rating_value) VALUES (?, ?, ?)",
             (schedule_id, rater_telegram_id, rating)
         )
-        await db.commit()
+        duty = await db.fetchone("SELECT week_start_date, resident_id, room_id FROM schedule WHERE id = ?", (schedule_id,))
+        if duty:
+            await _add_to_rollup(db, duty[0], duty[1], duty[2], **_rating_deltas(rating))
+    return await _write(op)
 
 # --- Функции для просмотра рейтинга ---
 async def get_average_ratings():
-    async with aiosqlite.connect(DB_NAME) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("""
+    async with _backend.read() as db:
+        return await db.fetchall("""
             SELECT 
                 res.name,
-                AVG(rat.rating_value) as avg_rating,
+                CAST(AVG(rat.rating_value) AS REAL) as avg_rating,
                 COUNT(rat.id) as total_ratings
             FROM residents res
             LEFT JOIN schedule sch ON res.id = sch.resident_id
             LEFT JOIN ratings rat ON sch.id = rat.schedule_id
             GROUP BY res.name
-            ORDER BY avg_rating DESC
+            ORDER BY avg_rating DESC NULLS LAST
+        """)
+
+# --- Аналитика: недельные сводки ---
+# Сводка на (смену, жителя, комнату) хранит счетчики, которые только складываются,
+# поэтому каждая запись (назначение, выполнение, оценка) добавляет к ней приращения
+# в той же транзакции, а /stats и /admin_stats читают только сводки.
+ROLLUP_COUNTERS = (
+    "assigned", "completed", "timed_completions", "completion_seconds", "overdue_days",
+    "ratings_count", "ratings_sum", "rating_1", "rating_2", "rating_3", "rating_4", "rating_5",
+)
+
+_ROLLUP_UPSERT = f"""
+    INSERT INTO weekly_rollups (week_start, resident_id, room_id, {", ".join(ROLLUP_COUNTERS)})
+    VALUES (?, ?, ?, {", ".join("?" for _ in ROLLUP_COUNTERS)})
+    ON CONFLICT (week_start, resident_id, room_id) DO UPDATE SET
+    {", ".join(f"{name} = weekly_rollups.{name} + excluded.{name}" for name in ROLLUP_COUNTERS)}
+"""
+
+async def _add_to_rollup(db, week_start, resident_id, room_id, **deltas):
+    """Прибавляет приращения счетчиков к сводке смены (создает ее при необходимости)."""
+    values = tuple(deltas.get(name, 0) for name in ROLLUP_COUNTERS)
+    await db.execute(_ROLLUP_UPSERT, (_as_date(week_start), resident_id, room_id, *values))
+
+def _overdue_days(week_start, on_date):
+    """Сколько дней смена просрочена на дату on_date (смена длится 7 дней)."""
+    return max(0, (on_date - (_as_date(week_start) + timedelta(days=6))).days)
+
+def _completion_deltas(week_start, completed_at, overdue_days_counted=0):
+    """
+    Приращения при выполнении дежурства. Время выполнения считается от начала смены.
+    Дни просрочки открытого дежурства уже добавляет count_overdue_days, здесь - только
+    остаток сверх overdue_days_counted. У дежурств, выполненных до появления completed_at, время неизвестно.
+    """
+    if completed_at is None:
+        return {"completed": 1}
+    week_start = _as_date(week_start)
+    completed_at = _as_datetime(completed_at)
+    seconds = (completed_at - datetime.combine(week_start, time())).total_seconds()
+    return {
+        "completed": 1,
+        "timed_completions": 1,
+        "completion_seconds": max(0, int(seconds)),
+        "overdue_days": max(0, _overdue_days(week_start, completed_at.date()) - (overdue_days_counted or 0)),
+    }
+
+def _rating_deltas(rating):
+    deltas = {"ratings_count": 1, "ratings_sum": rating}
+    if 1 <= rating <= 5:
+        deltas[f"rating_{rating}"] = 1
+    return deltas
+
+async def _rebuild_rollups(db, weeks=None):
+    """
+    Пересчитывает сводки по сырым таблицам: за смены из weeks или, если weeks=None, целиком.
+    Нужен там, где приращениями не обойтись: удаление смены, импорт, первое заполнение.
+    """
+    if weeks is None:
+        await db.execute("DELETE FROM weekly_rollups")
+        filters = [("", ())]
+    else:
+        filters = []
+        for week in {_as_date(week) for week in weeks}:
+            await db.execute("DELETE FROM weekly_rollups WHERE week_start = ?", (week,))
+            filters.append(("WHERE s.week_start_date = ?", (week,)))
+
+    for where, params in filters:
+        duties = await db.fetchall(f"""
+            SELECT s.week_start_date, s.resident_id, s.room_id, s.is_completed, s.completed_at, s.overdue_days_counted
+            FROM schedule s {where}
+        """, params)
+        for week_start, resident_id, room_id, is_completed, completed_at, counted in duties:
+            # Те же приращения, что добавили count_overdue_days и complete_duty
+            deltas = {"assigned": 1, "overdue_days": counted or 0}
+            if is_completed:
+                for name, value in _completion_deltas(week_start, completed_at, counted).items():
+                    deltas[name] = deltas.get(name, 0) + value
+            await _add_to_rollup(db, week_start, resident_id, room_id, **deltas)
+
+        ratings = await db.fetchall(f"""
+            SELECT s.week_start_date, s.resident_id, s.room_id, rat.rating_value
+            FROM ratings rat JOIN schedule s ON s.id = rat.schedule_id {where}
+        """, params)
+        for week_start, resident_id, room_id, rating in ratings:
+            if rating is not None:
+                await _add_to_rollup(db, week_start, resident_id, room_id, **_rating_deltas(rating))
+
+async def count_overdue_days():
+    """
+    Добавляет в недельные сводки дни просрочки открытых дежурств, набежавшие
+    с прошлого подсчета (schedule.overdue_days_counted). Выполняется ежедневной задачей
+    планировщика; повторный вызов в тот же день ничего не меняет.
+    """
+    today = date.today()
+    async def op(db):
+        duties = await db.fetchall("""
+            SELECT id, week_start_date, resident_id, room_id, overdue_days_counted FROM schedule
+            WHERE is_completed = FALSE AND week_start_date < ?
+        """, (today - timedelta(days=6),))
+        for schedule_id, week_start, resident_id, room_id, counted in duties:
+            counted = counted or 0
+            overdue_days = _overdue_days(week_start, today)
+            if overdue_days <= counted:
+                continue
+            # Сравнение со старым значением: параллельный подсчет другим воркером не удвоит дни
+            updated = await db.execute("""
+                UPDATE schedule SET overdue_days_counted = ?
+                WHERE id = ? AND is_completed = FALSE AND COALESCE(overdue_days_counted, 0) = ?
+            """, (overdue_days, schedule_id, counted))
+            if updated:
+                await _add_to_rollup(db, week_start, resident_id, room_id, overdue_days=overdue_days - counted)
+    return await _write(op)
+
+_ROLLUP_SUMS = ", ".join(f"COALESCE(SUM(w.{name}), 0) AS {name}" for name in ROLLUP_COUNTERS)
+
+async def get_resident_stats(telegram_id, weeks=8):
+    """
+    Статистика жителя из сводок: итог за все время и по последним weeks сменам.
+    Возвращает (итог, список смен от новых к старым) или None, если житель не найден.
+    """
+    async with _backend.read() as db:
+        totals = await db.fetchone(f"""
+            SELECT res.name, {_ROLLUP_SUMS}
+            FROM residents res
+            LEFT JOIN weekly_rollups w ON w.resident_id = res.id
+            WHERE res.telegram_id = ?
+            GROUP BY res.name
+        """, (telegram_id,))
+        if not totals:
+            return None
+        by_week = await db.fetchall(f"""
+            SELECT w.week_start, {_ROLLUP_SUMS}
+            FROM weekly_rollups w
+            JOIN residents res ON res.id = w.resident_id
+            WHERE res.telegram_id = ?
+            GROUP BY w.week_start
+            ORDER BY w.week_start DESC
+            LIMIT ?
+        """, (telegram_id, weeks))
+        return totals, by_week
+
+async def get_all_residents_stats():
+    """Итоговая статистика по каждому жителю из сводок."""
+    async with _backend.read() as db:
+        return await db.fetchall(f"""
+            SELECT res.name, {_ROLLUP_SUMS}
+            FROM residents res
+            LEFT JOIN weekly_rollups w ON w.resident_id = res.id
+            GROUP BY res.name
+            ORDER BY res.name
         """)
-        return await cursor.fetchall()
 
 # --- Функция для просмотра расписания ---
 async def get_current_week_schedule():
     """Возвращает список дежурств для самой последней смены."""
-    async with aiosqlite.connect(DB_NAME) as db:
-        db.row_factory = aiosqlite.Row
+    async with _backend.read() as db:
         
         # Сначала находим самую последнюю дату начала смены
-        cursor = await db.execute("SELECT MAX(week_start_date) FROM schedule")
-        latest_date_tuple = await cursor.fetchone()
+        latest_date_tuple = await db.fetchone("SELECT MAX(week_start_date) FROM schedule")
         
         if not latest_date_tuple or not latest_date_tuple[0]:
             return [] # Возвращаем пустой список, если расписаний еще нет
@@ -272,7 +561,7 @@ async def get_current_week_schedule():
         latest_date = latest_date_tuple[0]
         
         # Теперь получаем все записи для этой даты
-        cursor = await db.execute("""
+        return await db.fetchall("""
             SELECT 
                 res.name as resident_name, 
                 rm.name as room_name, 
@@ -283,21 +572,175 @@ async def get_current_week_schedule():
             WHERE s.week_start_date = ?
             ORDER BY rm.name
         """, (latest_date,))
-        
-        return await cursor.fetchall()
 
 async def get_user_duty(telegram_id):
     """Получает информацию о дежурстве пользователя на текущей неделе."""
-    async with aiosqlite.connect(DB_NAME) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("""
+    async with _backend.read() as db:
+        return await db.fetchone("""
             SELECT s.id, r.name as resident_name, rm.name as room_name, r.telegram_id
             FROM schedule s
             JOIN residents r ON s.resident_id = r.id
             JOIN rooms rm ON s.room_id = rm.id
             WHERE s.is_completed = FALSE 
-            AND date('now') >= s.week_start_date 
-            AND date('now') <= date(s.week_start_date, '+6 days')
+            AND s.week_start_date >= ?
+            AND s.week_start_date <= ?
             AND r.telegram_id = ?
-        """, (telegram_id,))
-        return await cursor.fetchone()
\ No newline at end of file
+        """, (*_current_shift_bounds(), telegram_id))
+
+# --- Очередь исходящих уведомлений (outbox) ---
+async def _enqueue_notification(db, kind, telegram_id, schedule_id):
+    """
+    Ставит уведомление в outbox в транзакции породившей его записи.
+    Одно и то же уведомление (вид, дежурство, получатель) второй раз не ставится.
+    Возвращает id уведомления или None, если оно уже было в очереди.
+    """
+    row = await db.fetchone("""
+        INSERT INTO outbox (dedup_key, kind, telegram_id, schedule_id, created_at) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (dedup_key) DO NOTHING
+        RETURNING id
+    """, (f"{kind}:{schedule_id}:{telegram_id}", kind, telegram_id, schedule_id, _utcnow()))
+    return row[0] if row else None
+
+async def claim_notifications(holder, claim_seconds, ids=None, limit=BULK_CHUNK_SIZE):
+    """
+    Забирает неотправленные уведомления на отправку: holder держит их claim_seconds,
+    и другие воркеры их не трогают. ids - забрать только эти уведомления.
+    Возвращает забранные уведомления с названием комнаты (None, если дежурство удалено).
+    """
+    now = _utcnow()
+    pending = "sent_at IS NULL AND (claimed_until IS NULL OR claimed_until < ?)"
+    params = [now]
+    if ids is not None:
+        if not ids:
+            return []
+        pending += f" AND id IN ({', '.join('?' for _ in ids)})"
+        params += list(ids)
+    async def op(db):
+        # Заодно чистим давно отправленные уведомления, чтобы таблица не росла
+        await db.execute("DELETE FROM outbox WHERE sent_at < ?", (now - timedelta(days=30),))
+        # Строки, которые прямо сейчас забирает другой воркер, пропускаются (skip_locked),
+        # а условие повторяется снаружи подзапроса на случай, если их уже забрали
+        claimed = await db.fetchall(f"""
+            UPDATE outbox SET claimed_by = ?, claimed_until = ?
+            WHERE id IN (SELECT id FROM outbox WHERE {pending} ORDER BY id LIMIT ? {_backend.skip_locked()})
+            AND {pending}
+            RETURNING id
+        """, (holder, now + timedelta(seconds=claim_seconds), *params, limit, *params))
+        if not claimed:
+            return []
+        claimed_ids = [row[0] for row in claimed]
+        return await db.fetchall(f"""
+            SELECT o.id, o.kind, o.telegram_id, o.schedule_id, rm.name AS room_name
+            FROM outbox o
+            LEFT JOIN schedule s ON s.id = o.schedule_id
+            LEFT JOIN rooms rm ON rm.id = s.room_id
+            WHERE o.id IN ({', '.join('?' for _ in claimed_ids)})
+            ORDER BY o.id
+        """, claimed_ids)
+    return await _write(op, changes_data=False)
+
+async def mark_notification_sent(notification_id):
+    async def op(db):
+        await db.execute("UPDATE outbox SET sent_at = ? WHERE id = ?", (_utcnow(), notification_id))
+    return await _write(op, changes_data=False)
+
+async def release_notification_claims(holder):
+    """Возвращает в очередь неотправленные уведомления holder (при остановке), чтобы их дослал следующий запуск."""
+    async def op(db):
+        return await db.execute(
+            "UPDATE outbox SET claimed_by = NULL, claimed_until = NULL WHERE claimed_by = ? AND sent_at IS NULL",
+            (holder,)
+        )
+    return await _write(op, changes_data=False)
+
+# --- Аренды задач планировщика ---
+async def acquire_job_lease(lease_key, holder, ttl_seconds):
+    """
+    Пытается взять аренду lease_key для holder на ttl_seconds.
+    Удается, только если аренды нет или она истекла (повторно взять
+    свою же действующую аренду нельзя - срабатывание не выполнится дважды).
+    Возвращает True, если аренда теперь у holder.
+    """
+    now = _utcnow()
+    async def op(db):
+        # Заодно чистим давно истекшие аренды, чтобы таблица не росла
+        await db.execute("DELETE FROM job_leases WHERE expires_at < ?", (now - timedelta(days=1),))
+        taken = await db.execute("""
+            INSERT INTO job_leases (lease_key, holder, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT (lease_key) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+            WHERE job_leases.expires_at < ?
+        """, (lease_key, holder, now + timedelta(seconds=ttl_seconds), now))
+        return taken > 0
+    return await _write(op, changes_data=False)
+
+# --- Массовый импорт/экспорт ---
+# Таблицы, доступные для импорта/экспорта, и их колонки с типами (порядок важен:
+# при импорте сначала жители и комнаты, потом расписание, потом оценки)
+BULK_TABLES = {
+    "residents": (("id", "int"), ("name", "text"), ("telegram_id", "int"),
+                  ("consecutive_cleanings", "int"), ("last_cleaned_room_id", "int")),
+    "rooms": (("id", "int"), ("name", "text")),
+    "schedule": (("id", "int"), ("resident_id", "int"), ("room_id", "int"), ("week_start_date", "date"),
+                 ("is_completed", "bool"), ("reminder_level", "int"),
+                 ("last_reminded_at", "timestamp"), ("next_reminder_at", "timestamp"),
+                 ("completed_at", "timestamp")),
+    "ratings": (("id", "int"), ("schedule_id", "int"), ("rater_telegram_id", "int"), ("rating_value", "int")),
+}
+
+async def iter_table_rows(table, after_id=0, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Асинхронный генератор строк таблицы по возрастанию id, начиная после after_id.
+    Читает порциями по chunk_size (keyset-пагинация), так что память не зависит от размера таблицы.
+    """
+    columns = ", ".join(name for name, _ in BULK_TABLES[table])
+    while True:
+        async with _backend.read() as db:
+            rows = await db.fetchall(
+                f"SELECT {columns} FROM {table} WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, chunk_size)
+            )
+        for row in rows:
+            yield row
+        if len(rows) < chunk_size:
+            return
+        after_id = rows[-1][0]
+
+async def import_table_rows(table, rows):
+    """
+    Вставляет или обновляет (по id) порцию строк одной транзакцией.
+    rows - кортежи значений в порядке колонок BULK_TABLES[table]. Возвращает число строк.
+    """
+    names = [name for name, _ in BULK_TABLES[table]]
+    updates = ", ".join(f"{name} = excluded.{name}" for name in names if name != "id")
+    sql = f"""
+        INSERT INTO {table} ({", ".join(names)}) VALUES ({", ".join("?" for _ in names)})
+        ON CONFLICT (id) DO UPDATE SET {updates}
+    """
+    async def op(db):
+        # Сводки пересчитываются за смены, к которым строки относились до импорта и после
+        affects_rollups = table in ("schedule", "ratings")
+        ids = [row[0] for row in rows]
+        if affects_rollups:
+            weeks = await _weeks_of_rows(db, table, ids)
+        await db.executemany(sql, rows)
+        await _backend.sync_id_sequence(db, table)
+        if affects_rollups:
+            weeks |= await _weeks_of_rows(db, table, ids)
+            await _rebuild_rollups(db, weeks)
+        return len(rows)
+    return await _write(op)
+
+async def _weeks_of_rows(db, table, ids):
+    """Даты смен, к которым относятся строки schedule или ratings с данными id."""
+    if not ids:
+        return set()
+    placeholders = ", ".join("?" for _ in ids)
+    if table == "schedule":
+        sql = f"SELECT DISTINCT week_start_date FROM schedule WHERE id IN ({placeholders})"
+    else:
+        sql = f"""
+            SELECT DISTINCT s.week_start_date FROM ratings rat
+            JOIN schedule s ON s.id = rat.schedule_id
+            WHERE rat.id IN ({placeholders})
+        """
+    return {_as_date(row[0]) for row in await db.fetchall(sql, ids)}
@@ -1,8 +1,10 @@
 # app/handlers/admin.py
-import shlex
+import html
+import os
+import tempfile
 from datetime import date
 from aiogram import Router, Bot, F
-from aiogram.types import Message
+from aiogram.types import Message, FSInputFile
 # ИЗМЕНЕНО: Добавляем 'Filter'
 from aiogram.filters import Command, Filter, CommandObject
 
@@ -12,13 +14,18 @@ ADMIN_IDS = [1793655579] # Пример: [123456789]
 # Импортируем нужные функции
 from app.scheduler.tasks import assign_duties
 from app.db.database import (
-    get_current_week_schedule, is_schedule_empty,
+    is_schedule_empty,
     # <-- ДОБАВЛЯЕМ НОВЫЕ ИМПОРТЫ
     clear_latest_uncompleted_schedule, get_resident_by_name,
     get_room_by_name, get_latest_schedule_date,
     add_schedule_entry, set_resident_cleaning_stats
 )
 from app.utils.error_logging import ERROR_LOGS, add_error_log
+from app.config import PERF_MONITOR_ENABLED
+from app.utils.perf import get_lag_stats, get_top_slow_callbacks
+from app.utils.rendering import get_schedule_text, get_all_stats_text
+from app.utils.transfer import FORMATS, export_table, import_table, guess_format
+from app.db.database import BULK_TABLES
 from app.keyboards.inline import get_confirm_keyboard
 
 router = Router()
@@ -57,18 +64,13 @@ async def admin_check_schedule(message: Message):
         await message.answer("База данных расписаний пуста. Дежурств еще не было.")
         return
         
-    schedule_data = await get_current_week_schedule()
+    # Тот же отрисованный (и закэшированный) ответ, что и у /schedule
+    response = await get_schedule_text()
     
-    if not schedule_data:
+    if not response:
         await message.answer("🧹 План уборки на эту смену еще не сформирован (хотя в БД что-то есть).")
         return
 
-    # (Код взят из common.py)
-    response = "🗓️ **План уборки на текущую смену:**\n\n"
-    for duty in schedule_data:
-        status_icon = "✅ Выполнено" if duty['is_completed'] else "❌ Не выполнено"
-        response += f"**{duty['room_name']}**: {duty['resident_name']} ({status_icon})\n"
-    
     await message.answer(response)
 
 # Команда 3: /admin_logs (Проверить ошибки)
@@ -106,6 +108,95 @@ async def admin_clear_schedule(message: Message):
 
 
 
+# Команда 5: /admin_perf (Производительность event loop)
+@router.message(Command("admin_perf"), AdminFilter())
+async def admin_perf(message: Message):
+    """
+    Показывает задержку event loop и самые медленные колбэки.
+    """
+    if not PERF_MONITOR_ENABLED:
+        await message.answer("Мониторинг производительности выключен (PERF_MONITOR_ENABLED=0).")
+        return
+
+    lag_stats = get_lag_stats()
+    lines = ["<b>⏱ Производительность event loop</b>\n"]
+    if lag_stats:
+        avg_lag, p95_lag, max_lag = lag_stats
+        lines.append(f"Задержка loop: среднее {avg_lag * 1000:.1f} мс, p95 {p95_lag * 1000:.1f} мс, макс {max_lag * 1000:.1f} мс\n")
+    else:
+        lines.append("Замеров задержки еще нет.\n")
+
+    top = get_top_slow_callbacks()
+    if not top:
+        lines.append("✅ Медленных колбэков не было.")
+    else:
+        lines.append("<b>Медленные колбэки (по суммарному времени):</b>")
+        for name, count, total, worst in top:
+            lines.append(f"• <code>{html.escape(name)}</code>: {count} раз, всего {total * 1000:.0f} мс, макс {worst * 1000:.0f} мс")
+
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+# Команда 7: /admin_export <таблица> [csv|jsonl] (Выгрузка таблицы файлом)
+@router.message(Command("admin_export"), AdminFilter())
+async def admin_export(message: Message, command: CommandObject):
+    """
+    Выгружает таблицу (residents, rooms, schedule, ratings) в CSV или JSON Lines и присылает файлом.
+    """
+    args = (command.args or "").split()
+    table = args[0] if args else None
+    fmt = args[1] if len(args) > 1 else "csv"
+    if table not in BULK_TABLES or fmt not in FORMATS:
+        await message.answer(f"Использование: /admin_export <{'|'.join(BULK_TABLES)}> [{'|'.join(FORMATS)}]", parse_mode=None)
+        return
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, f"{table}.{fmt}")
+            count = await export_table(table, fmt, path)
+            await message.answer_document(FSInputFile(path), caption=f"✅ {table}: {count} строк")
+    except Exception as e:
+        error_msg = f"admin_export: {e}"
+        add_error_log(error_msg)
+        await message.answer(f"❌ ОШИБКА при выгрузке: {e}", parse_mode=None)
+
+# Команда 8: /admin_import <таблица> (подписью к файлу CSV/JSON Lines)
+@router.message(F.document, F.caption.startswith("/admin_import"), AdminFilter())
+async def admin_import(message: Message, bot: Bot):
+    """
+    Загружает строки из присланного файла в таблицу: новые id вставляются, существующие обновляются.
+    """
+    args = message.caption.split()[1:]
+    table = args[0] if args else None
+    if table not in BULK_TABLES:
+        await message.answer(f"Пришлите файл с подписью: /admin_import <{'|'.join(BULK_TABLES)}>", parse_mode=None)
+        return
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Имя файла выбирает отправитель - берем из него только формат, чтобы путь не вышел за tmp_dir
+            fmt = guess_format(message.document.file_name or "")
+            path = os.path.join(tmp_dir, f"{table}.{fmt}")
+            await bot.download(message.document, destination=path)
+            count = await import_table(table, fmt, path)
+        await message.answer(f"✅ Загружено строк в {table}: {count}.")
+    except Exception as e:
+        error_msg = f"admin_import: {e}"
+        add_error_log(error_msg)
+        await message.answer(f"❌ ОШИБКА при загрузке (уже загруженные порции сохранены): {e}", parse_mode=None)
+
+# Команда 9: /admin_stats (Статистика по всем жителям)
+@router.message(Command("admin_stats"), AdminFilter())
+async def admin_stats(message: Message):
+    """
+    Показывает выполнение, время до выполнения, просрочки и оценки по каждому жителю.
+    """
+    response = await get_all_stats_text()
+    if not response:
+        await message.answer("В базе еще нет жителей.")
+        return
+
+    await message.answer(response)
+
 # Команда 6: /admin_help (Обновленный)
 @router.message(AdminFilter(), Command("admin_help"))
 async def admin_help(message: Message):
@@ -121,7 +212,13 @@ async def admin_help(message: Message):
         
         "<b>📊 Просмотр информации:</b>\n"
         "• /admin_check_schedule - <i>Текущий план уборки</i> (аналог /schedule)\n"
-        "• /admin_logs - <i>Последние 20 ошибок бота</i>\n\n"
+        "• /admin_stats - <i>Статистика уборок по всем жителям</i>\n"
+        "• /admin_logs - <i>Последние 20 ошибок бота</i>\n"
+        "• /admin_perf - <i>Задержка event loop и самые медленные колбэки</i>\n\n"
+
+        "<b>📦 Импорт и экспорт:</b>\n"
+        "• /admin_export &lt;таблица&gt; [csv|jsonl] - <i>Выгрузить residents, rooms, schedule или ratings файлом</i>\n"
+        "• /admin_import &lt;таблица&gt; - <i>Подписью к файлу: загрузить строки (вставка/обновление по id)</i>\n\n"
         
     )
     
@@ -1,11 +1,8 @@
 # app/handlers/callbacks.py
 from aiogram import Router, F, Bot
-from aiogram.types import CallbackQuery
-from app.db.database import (
-    complete_duty, get_duty_details_for_rating, 
-    get_all_residents_for_rating, save_rating
-)
-from app.keyboards.inline import get_rating_keyboard
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup
+from app.db.database import complete_duty, save_rating
+from app.scheduler.tasks import deliver_notifications
 from app.utils.error_logging import add_error_log
 
 router = Router()
@@ -14,32 +11,23 @@ router = Router()
 async def process_confirm_callback(callback: CallbackQuery, bot: Bot):
     schedule_id = int(callback.data.split("_")[1])
     
-    await complete_duty(schedule_id)
+    # Просьбы оценить уборку ставятся в outbox вместе с отметкой о выполнении
+    rating_request_ids = await complete_duty(schedule_id)
     
-    await callback.message.edit_text("✅ Отлично, спасибо! Твоя работа отмечена.")
+    # В напоминании-дайджесте убираем только нажатую кнопку, остальные дежурства остаются
+    keyboard = callback.message.reply_markup
+    remaining_rows = [
+        row for row in (keyboard.inline_keyboard if keyboard else [])
+        if all(button.callback_data != callback.data for button in row)
+    ]
+    if remaining_rows:
+        await callback.message.edit_reply_markup(reply_markup=InlineKeyboardMarkup(inline_keyboard=remaining_rows))
+    else:
+        await callback.message.edit_text("✅ Отлично, спасибо! Твоя работа отмечена.")
     await callback.answer("Уборка подтверждена!")
 
-    # Запускаем процесс оценки
-    duty_details = await get_duty_details_for_rating(schedule_id)
-    all_residents = await get_all_residents_for_rating()
-
-    rating_message = f"Оцените, пожалуйста, качество уборки в комнате: **{duty_details['room_name']}**."
-    rating_keyboard = get_rating_keyboard(schedule_id)
-
-    for res in all_residents:
-        # Не отправляем сообщение тому, кто убирался
-        if res['telegram_id'] != duty_details['cleaner_tg_id']:
-            try:
-                await bot.send_message(
-                    chat_id=res['telegram_id'],
-                    text=rating_message,
-                    parse_mode="Markdown",
-                    reply_markup=rating_keyboard
-                )
-            except Exception as e:
-                error_msg = f"Failed to send rating request to {res['telegram_id']}: {e}"
-                print(error_msg)
-                add_error_log(error_msg)
+    # Запускаем процесс оценки (если рассылку прервет остановка бота, ее дошлет следующий запуск)
+    await deliver_notifications(bot, rating_request_ids)
 
 @router.callback_query(F.data.startswith("rate_"))
 async def process_rating_callback(callback: CallbackQuery):
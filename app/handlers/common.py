@@ -3,9 +3,8 @@ from aiogram import Router, F
 from aiogram.types import Message
 from aiogram.filters import CommandStart
 from aiogram import Bot
-# Добавляем новый импорт
-from app.db.database import get_resident_by_tg_id, get_average_ratings, get_current_week_schedule
-from app.db.database import get_user_duty
+from app.db.database import get_resident_by_tg_id, get_user_duty
+from app.utils.rendering import get_schedule_text, get_ratings_text, get_resident_stats_text
 from app.keyboards.inline import get_confirm_keyboard
 
 router = Router()
@@ -21,6 +20,7 @@ async def cmd_start(message: Message):
             "**Доступные команды:**\n"
             "/schedule - посмотреть текущий план уборки\n"
             "/ratings - посмотреть рейтинг качества уборок\n"
+            "/stats - твоя статистика уборок\n"
             "/confirmation - подтвердить выполнение уборки"
         )
     else:
@@ -39,17 +39,12 @@ async def cmd_schedule(message: Message):
         await message.answer("Сначала вам нужно зарегистрироваться. Отправьте свое имя.")
         return
 
-    schedule_data = await get_current_week_schedule()
+    response = await get_schedule_text()
 
-    if not schedule_data:
+    if not response:
         await message.answer("🧹 План уборки на эту смену еще не сформирован.")
         return
 
-    response = "🗓️ **План уборки на текущую смену:**\n\n"
-    for duty in schedule_data:
-        status_icon = "✅ Выполнено" if duty['is_completed'] else "❌ Не выполнено"
-        response += f"**{duty['room_name']}**: {duty['resident_name']} ({status_icon})\n"
-    
     await message.answer(response)
 
 
@@ -60,19 +55,22 @@ async def cmd_ratings(message: Message):
         await message.answer("Сначала вам нужно зарегистрироваться. Отправьте свое имя.")
         return
         
-    ratings = await get_average_ratings()
-    if not ratings:
+    response = await get_ratings_text()
+    if not response:
         await message.answer("Пока нет ни одной оценки.")
         return
-    
-    response = "🏆 **Рейтинг качества уборок** 🏆\n\n"
-    for r in ratings:
-        avg_rating = r['avg_rating'] if r['avg_rating'] is not None else 0
-        star_rating = "⭐" * int(round(avg_rating)) + "☆" * (5 - int(round(avg_rating)))
-        response += f"**{r['name']}**: {avg_rating:.2f}/5.00 ({star_rating}) - *оценок: {r['total_ratings']}*\n"
         
     await message.answer(response, parse_mode="Markdown")
 
+@router.message(F.text == "/stats")
+async def cmd_stats(message: Message):
+    response = await get_resident_stats_text(message.from_user.id)
+    if not response:
+        await message.answer("Сначала вам нужно зарегистрироваться. Отправьте свое имя.")
+        return
+
+    await message.answer(response)
+
 @router.message(F.text == "/confirmation")
 async def cmd_confirmation(message: Message, bot: Bot):
     user = await get_resident_by_tg_id(message.from_user.id)
@@ -8,6 +8,18 @@ def get_confirm_keyboard(schedule_id: int) -> InlineKeyboardMarkup:
         [InlineKeyboardButton(text="✅ Я убрался!", callback_data=f"confirm_{schedule_id}")]
     ])
 
+def get_digest_confirm_keyboard(duties) -> InlineKeyboardMarkup:
+    """
+    Клавиатура для напоминания-дайджеста: по кнопке на каждое дежурство.
+    duties - список пар (schedule_id, room_name).
+    """
+    if len(duties) == 1:
+        return get_confirm_keyboard(duties[0][0])
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=f"✅ Убрал: {room_name}", callback_data=f"confirm_{schedule_id}")]
+        for schedule_id, room_name in duties
+    ])
+
 def get_rating_keyboard(schedule_id: int) -> InlineKeyboardMarkup:
     """Создает клавиатуру для оценки уборки."""
     buttons = [
@@ -0,0 +1,12 @@
+# app/middlewares.py
+from aiogram import BaseMiddleware
+
+from app.shutdown import in_flight
+
+
+class InFlightMiddleware(BaseMiddleware):
+    """Отмечает обработку апдейта как работу, которую остановка бота должна дождаться."""
+
+    async def __call__(self, handler, event, data):
+        async with in_flight():
+            return await handler(event, data)
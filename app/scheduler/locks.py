@@ -0,0 +1,60 @@
+# app/scheduler/locks.py
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from app.config import JOB_LEASE_SECONDS, JOB_FIRE_TOLERANCE_SECONDS, SHARD_TAKEOVER_DELAY_SECONDS
+from app.db.database import acquire_job_lease
+from app import sharding
+from app.shutdown import in_flight
+
+
+def _scheduled_fire_time(trigger) -> str:
+    """
+    Срабатывание триггера, к которому относится текущий запуск: ближайшее время
+    по расписанию, не раньше чем JOB_FIRE_TOLERANCE_SECONDS назад. В отличие от
+    текущих часов, оно одинаково у всех воркеров, даже если их часы немного расходятся
+    или event loop запоздал через границу минуты. Срабатывания триггера должны идти
+    реже JOB_FIRE_TOLERANCE_SECONDS.
+    """
+    now = datetime.now(trigger.timezone)
+    fire_time = trigger.get_next_fire_time(None, now - timedelta(seconds=JOB_FIRE_TOLERANCE_SECONDS))
+    return fire_time.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%MZ")
+
+
+async def run_exclusive(job_name: str, job, *args, trigger=None, per_shard: bool = False):
+    """
+    Запускает задачу, только если этот воркер взял аренду на срабатывание trigger.
+    Так при нескольких воркерах каждое срабатывание выполняется один раз.
+    Без trigger (разовые задачи при старте) аренда одна на задачу и держится JOB_LEASE_SECONDS.
+
+    per_shard=True - аренда берется на срабатывание и долю получателей: волну рассылают
+    все воркеры, каждый своим чатам (см. app/sharding.py), а задача получает shard=.
+    Доли, которые никто не взял за SHARD_TAKEOVER_DELAY_SECONDS (воркер упал или не запущен),
+    забирают оставшиеся воркеры, чтобы их жители не пропускали волну.
+    """
+    lease_key = job_name
+    if trigger is not None:
+        lease_key += f":{_scheduled_fire_time(trigger)}"
+
+    if not per_shard:
+        # Остановка бота дождется задачи, прежде чем закрыть БД
+        async with in_flight():
+            if not await acquire_job_lease(lease_key, sharding.worker_name(), JOB_LEASE_SECONDS):
+                logging.info(f"{job_name}: срабатывание {lease_key} уже выполняет другой воркер, пропускаю.")
+                return
+            await job(*args)
+        return
+
+    for offset in range(sharding.WORKER_COUNT):
+        shard = (sharding.WORKER_ID + offset) % sharding.WORKER_COUNT
+        if offset == 1:
+            # Живые воркеры к этому времени уже взяли аренды своих долей
+            await asyncio.sleep(SHARD_TAKEOVER_DELAY_SECONDS)
+        async with in_flight():
+            shard_key = f"{lease_key}:{shard}/{sharding.WORKER_COUNT}"
+            if not await acquire_job_lease(shard_key, sharding.worker_name(), JOB_LEASE_SECONDS):
+                continue
+            if offset:
+                logging.warning(f"{job_name}: долю {shard} никто не взял, выполняю ее за воркер {shard}.")
+            await job(*args, shard=shard)
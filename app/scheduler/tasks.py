@@ -2,28 +2,23 @@
 import random
 from datetime import date
 from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
 from app.db.database import (
     get_cleaning_candidates, get_all_rooms, get_all_resident_ids,
-    add_schedule_entry, update_resident_cleaning_stats,
-    get_uncompleted_duties_for_today, get_overdue_duties,
-    delete_schedule_by_date
+    replace_schedule, get_uncompleted_duties_for_today, get_overdue_duties,
+    DIGEST_SEPARATOR, get_uncompleted_duties_digest, get_overdue_duties_digest,
+    get_reminder_message, save_reminder_message, mark_overdue_reminded,
+    claim_notifications, mark_notification_sent, count_overdue_days
 )
-from app.keyboards.inline import get_confirm_keyboard
-from app.config import OVERDUE_MESSAGES
+from app.keyboards.inline import get_confirm_keyboard, get_digest_confirm_keyboard, get_rating_keyboard
+from app.config import OVERDUE_MESSAGES, OVERDUE_ESCALATION_STEP, REMINDER_DIGEST_MODE, NOTIFICATION_CLAIM_SECONDS
 from app.utils.error_logging import add_error_log
+from app.sharding import owns_chat, worker_name
 
 async def assign_duties(bot: Bot):
     """Назначает дежурных на следующую смену."""
     print("Запускаю процесс назначения дежурных...")
     week_start_date = date.today()
-    try:
-        await delete_schedule_by_date(week_start_date)
-        print(f"Очищены все предыдущие записи для {week_start_date}.")
-    except Exception as e:
-        error_msg = f"Не удалось очистить расписание для {week_start_date}: {e}"
-        print(error_msg)
-        add_error_log(error_msg)
-        return # Останавливаемся, если не смогли очистить
 
     candidates = await get_cleaning_candidates() # Теперь это ВСЕ жители, отсортированные
     rooms = await get_all_rooms()
@@ -68,51 +63,143 @@ async def assign_duties(bot: Bot):
     assignments_with_data = [(resident_map[res_id], room_map[room_id]) for res_id, room_id in temp_assignments.items()]
     
     # --- Сохранение в БД и отправка уведомлений ---
+
+    # 1. Одной транзакцией заменяем записи за сегодня, обновляем статистику
+    #    и ставим уведомления в outbox (если бот остановят до отправки, их дошлет следующий запуск)
+    assignments = [(res['id'], room['id'], res['telegram_id']) for res, room in assignments_with_data]
+    try:
+        await replace_schedule(week_start_date, assignments, await get_all_resident_ids())
+    except Exception as e:
+        error_msg = f"Не удалось сохранить расписание для {week_start_date}: {e}"
+        print(error_msg)
+        add_error_log(error_msg)
+        return
+
+    # 2. Теперь безопасно отправляем уведомления
+    await deliver_notifications(bot)
     
-    notifications_to_send = []
-
-    # 1. Сначала сохраняем все дежурства в БД
-    for resident, room in assignments_with_data:
-        schedule_id = await add_schedule_entry(resident['id'], room['id'], week_start_date) 
-        if resident['telegram_id']:
-            notifications_to_send.append({
-                'telegram_id': resident['telegram_id'],
-                'resident_name': resident['name'],
-                'room_name': room['name'],
-                'schedule_id': schedule_id
-            })
-
-    # 2. Затем обновляем статистику всех жителей
-    all_resident_ids = await get_all_resident_ids()
-    assigned_id_pairs = [(res['id'], room['id']) for res, room in assignments_with_data]
-    await update_resident_cleaning_stats(assigned_id_pairs, all_resident_ids)
-    
-    # 3. Теперь безопасно отправляем уведомления
-    for notification in notifications_to_send:
+    print(f"Дежурства успешно назначены.")
+
+
+def _render_notification(notification):
+    """Текст и клавиатура уведомления из outbox по его виду."""
+    if notification['kind'] == "assignment":
+        return (f"🧹 Новое дежурство!\n\n"
+                f"На этой неделе твоя очередь убирать: **{notification['room_name']}**.\n\n"
+                "Когда закончишь, нажми на кнопку ниже."), get_confirm_keyboard(notification['schedule_id'])
+    return (f"Оцените, пожалуйста, качество уборки в комнате: **{notification['room_name']}**.",
+            get_rating_keyboard(notification['schedule_id']))
+
+
+async def deliver_notifications(bot: Bot, ids=None):
+    """
+    Отправляет уведомления из outbox (о назначении и просьбы оценить уборку).
+    ids=None - все неотправленные, порциями; иначе только перечисленные.
+    Каждое уведомление помечается отправленным сразу после отправки, поэтому
+    прерванная рассылка при следующем запуске продолжится без повторов.
+    """
+    holder = worker_name()
+    while True:
+        notifications = await claim_notifications(holder, NOTIFICATION_CLAIM_SECONDS, ids)
+        if not notifications:
+            return
+        for notification in notifications:
+            # Дежурство удалено (например, переназначением) - уведомление устарело
+            if notification['room_name'] is not None:
+                try:
+                    text, keyboard = _render_notification(notification)
+                    await bot.send_message(
+                        chat_id=notification['telegram_id'],
+                        text=text,
+                        parse_mode="Markdown",
+                        reply_markup=keyboard
+                    )
+                except Exception as e:
+                    # Как и раньше, не повторяем: житель мог заблокировать бота
+                    error_msg = f"Не удалось отправить уведомление ({notification['kind']}) жителю {notification['telegram_id']}: {e}"
+                    print(error_msg)
+                    add_error_log(error_msg)
+            await mark_notification_sent(notification['id'])
+        if ids is not None:
+            return
+
+
+def _parse_digest(digest):
+    """Разбирает строку дайджеста в отсортированный список пар (schedule_id, room_name)."""
+    schedule_ids = [int(i) for i in digest['schedule_ids'].split(',')]
+    room_names = digest['room_names'].split(DIGEST_SEPARATOR)
+    return sorted(zip(schedule_ids, room_names), key=lambda duty: duty[1])
+
+
+def _overdue_message(reminder_level: int, room_name: str) -> str:
+    """Выбирает текст напоминания о просрочке по уровню эскалации."""
+    index = min(reminder_level // OVERDUE_ESCALATION_STEP, len(OVERDUE_MESSAGES) - 1)
+    return OVERDUE_MESSAGES[index].format(room_name=room_name)
+
+
+async def _deliver_digest(bot: Bot, digest, kind: str, text: str, duties, version=None) -> bool:
+    """
+    Отправляет жителю одно напоминание на все его дежурства.
+    Если состав дежурств (и version, если передана) тот же, что в прошлой отправке,
+    редактирует прошлое сообщение вместо отправки нового.
+    Возвращает False, если сообщение уже было таким же и ничего не изменилось.
+    """
+    telegram_id = digest['telegram_id']
+    duty_key = ",".join(str(schedule_id) for schedule_id, _ in sorted(duties))
+    if version is not None:
+        duty_key += f"@{version}"
+    keyboard = get_digest_confirm_keyboard(duties)
+
+    previous = await get_reminder_message(telegram_id, kind)
+    if previous and previous['duty_key'] == duty_key:
         try:
-            message = (f"🧹 Новое дежурство!\n\n"
-                       f"На этой неделе твоя очередь убирать: **{notification['room_name']}**.\n\n"
-                       "Когда закончишь, нажми на кнопку ниже.")
-            await bot.send_message(
-                chat_id=notification['telegram_id'],
-                text=message,
-                reply_markup=get_confirm_keyboard(notification['schedule_id'])
+            await bot.edit_message_text(
+                chat_id=telegram_id,
+                message_id=previous['message_id'],
+                text=text,
+                parse_mode="Markdown",
+                reply_markup=keyboard
             )
-        except Exception as e:
-            # ИЗМЕНЕНО: Логгируем ошибку
-            error_msg = f"Не удалось отправить уведомление о назначении жителю {notification['resident_name']}: {e}"
-            print(error_msg)
-            add_error_log(error_msg)
-    
-    print(f"Дежурства успешно назначены.")
+            return True
+        except TelegramBadRequest as e:
+            if "message is not modified" in str(e):
+                return False
+            # Сообщение удалено или слишком старое - отправляем новое
+
+    sent = await bot.send_message(
+        chat_id=telegram_id,
+        text=text,
+        parse_mode="Markdown",
+        reply_markup=keyboard
+    )
+    await save_reminder_message(telegram_id, kind, sent.message_id, duty_key)
+    return True
 
 
-async def send_reminders(bot: Bot):
+async def send_reminders(bot: Bot, shard: int = None):
    
     print("Sending reminders...")
+    if REMINDER_DIGEST_MODE:
+        for digest in await get_uncompleted_duties_digest():
+            if not owns_chat(digest['telegram_id'], shard):
+                continue  # Этого жителя обслуживает другой воркер
+            try:
+                duties = _parse_digest(digest)
+                rooms = ", ".join(f"**{room_name}**" for _, room_name in duties)
+                message = (f"Не забудь, что на этой неделе твоя очередь убирать: {rooms}.\n"
+                           "Когда закончишь, нажми на кнопку ниже.")
+                # Дата волны в ключе: каждая волна приходит новым сообщением с уведомлением,
+                # а повторный запуск той же волны (перехват доли) лишь правит его
+                await _deliver_digest(bot, digest, "reminder", message, duties, version=date.today().isoformat())
+            except Exception as e:
+                error_msg = f"Failed to send reminder to {digest['resident_name']}: {e}"
+                print(error_msg)
+                add_error_log(error_msg)
+        return
+
     duties = await get_uncompleted_duties_for_today()
     for duty in duties:
-        if duty['telegram_id']:
+        if duty['telegram_id'] and owns_chat(duty['telegram_id'], shard):
             try:
                 message = (f"Не забудь, что на этой неделе твоя очередь убирать: **{duty['room_name']}**.\n"
                            "Когда закончишь, нажми на кнопку ниже.")
@@ -130,21 +217,49 @@ async def send_reminders(bot: Bot):
 
 
 
-async def send_overdue_reminders(bot: Bot):
-    # ... (эта функция без изменений)
+async def update_overdue_stats(bot: Bot):
+    """Раз в день добавляет в статистику (/stats) дни просрочки открытых дежурств, даже если житель так и не убрался."""
+    try:
+        await count_overdue_days()
+    except Exception as e:
+        error_msg = f"Failed to count overdue days: {e}"
+        print(error_msg)
+        add_error_log(error_msg)
+
+
+async def send_overdue_reminders(bot: Bot, shard: int = None):
     print("Sending overdue reminders...")
+    if REMINDER_DIGEST_MODE:
+        for digest in await get_overdue_duties_digest():
+            if not owns_chat(digest['telegram_id'], shard):
+                continue  # Этого жителя обслуживает другой воркер
+            try:
+                duties = _parse_digest(digest)
+                rooms = ", ".join(room_name for _, room_name in duties)
+                message = _overdue_message(digest['reminder_level'], rooms)
+                # Уровень в ключе: каждая волна - новое сообщение с уведомлением, а не
+                # тихая правка старого, иначе эскалация и потолок напоминаний проходят незаметно
+                if await _deliver_digest(bot, digest, "overdue", message, duties, version=digest['reminder_level']):
+                    await mark_overdue_reminded([schedule_id for schedule_id, _ in duties])
+            except Exception as e:
+                error_msg = f"Failed to send overdue reminder to {digest['resident_name']}: {e}"
+                print(error_msg)
+                add_error_log(error_msg)
+        return
+
     duties = await get_overdue_duties()
     for duty in duties:
-        if duty['telegram_id']:
+        if duty['telegram_id'] and owns_chat(duty['telegram_id'], shard):
             try:
-                message = random.choice(OVERDUE_MESSAGES).format(room_name=duty['room_name'])
+                message = _overdue_message(duty['reminder_level'], duty['room_name'])
                 await bot.send_message(
                     chat_id=duty['telegram_id'],
                     text=message,
                     parse_mode="Markdown",
                     reply_markup=get_confirm_keyboard(duty['id'])
                 )
+                await mark_overdue_reminded([duty['id']])
             except Exception as e:
                 error_msg = f"Failed to send overdue reminder to {duty['resident_name']}: {e}"
                 print(error_msg)
-                add_error_log(error_msg)
\ No newline at end of file
+                add_error_log(error_msg)
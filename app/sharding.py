@@ -0,0 +1,33 @@
+# app/sharding.py
+import os
+import socket
+
+# Номер этого воркера и общее число воркеров (см. app/workers.py).
+# В обычном режиме воркер один и ему принадлежат все чаты.
+WORKER_ID = 0
+WORKER_COUNT = 1
+
+
+def configure_worker(worker_id: int, worker_count: int):
+    """Задает номер воркера в многопроцессном режиме. Вызывается при старте процесса воркера."""
+    global WORKER_ID, WORKER_COUNT
+    WORKER_ID = worker_id
+    WORKER_COUNT = worker_count
+
+
+def shard_for_chat(chat_id: int, worker_count: int) -> int:
+    """Номер воркера, который обслуживает чат."""
+    return chat_id % worker_count
+
+
+def owns_chat(chat_id: int, shard: int = None) -> bool:
+    """
+    Обслуживает ли этот воркер данный чат (апдейты и рассылки волн).
+    shard - проверить принадлежность другой доле (когда воркер рассылает волну за упавший).
+    """
+    return shard_for_chat(chat_id, WORKER_COUNT) == (WORKER_ID if shard is None else shard)
+
+
+def worker_name() -> str:
+    """Уникальное имя процесса-воркера - владелец аренды задач планировщика."""
+    return f"{socket.gethostname()}:{os.getpid()}:{WORKER_ID}"
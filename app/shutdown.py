@@ -0,0 +1,80 @@
+# app/shutdown.py
+"""
+Корректная остановка бота (SIGTERM при передеплое, Ctrl+C).
+
+Опрос останавливает aiogram (он сам ловит SIGTERM/SIGINT), дальше graceful_shutdown:
+планировщик перестает запускать задачи, уже идущие обработчики и задачи дорабатывают
+(не дольше SHUTDOWN_TIMEOUT_SECONDS), outbox досылается, неотправленное возвращается
+в очередь до следующего запуска, и только потом закрываются сессия бота и БД.
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from app.config import SHUTDOWN_TIMEOUT_SECONDS
+from app.db.database import close_db, release_notification_claims
+from app.scheduler.tasks import deliver_notifications
+from app.sharding import worker_name
+
+# Задачи, которые остановка должна дождаться: обработчики апдейтов и задачи планировщика
+_in_flight = set()
+
+
+@asynccontextmanager
+async def in_flight():
+    """Отмечает текущую задачу как работу, которую надо дождаться при остановке."""
+    task = asyncio.current_task()
+    _in_flight.add(task)
+    try:
+        yield
+    finally:
+        _in_flight.discard(task)
+
+
+def track(task: asyncio.Task) -> asyncio.Task:
+    """То же для задачи, созданной напрямую (например, воркером для апдейта)."""
+    _in_flight.add(task)
+    task.add_done_callback(_in_flight.discard)
+    return task
+
+
+async def _drain_in_flight(timeout: float) -> int:
+    """Ждет незавершенные задачи не дольше timeout, остальные отменяет. Возвращает число отмененных."""
+    pending = _in_flight - {asyncio.current_task()}
+    if pending:
+        _, pending = await asyncio.wait(pending, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.wait(pending, timeout=1)
+    return len(pending)
+
+
+async def graceful_shutdown(bot, scheduler):
+    """Останавливает планировщик, дожидается работы в полете, досылает outbox и закрывает соединения."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + SHUTDOWN_TIMEOUT_SECONDS
+    try:
+        scheduler.shutdown(wait=False)
+
+        cancelled = await _drain_in_flight(SHUTDOWN_TIMEOUT_SECONDS)
+        if cancelled:
+            logging.warning(f"Не дождался {cancelled} обработчиков/задач за {SHUTDOWN_TIMEOUT_SECONDS} с, прерываю их.")
+
+        remaining = deadline - loop.time()
+        if remaining > 0:
+            try:
+                await asyncio.wait_for(deliver_notifications(bot), remaining)
+            except asyncio.TimeoutError:
+                logging.warning("Не успел дослать уведомления из outbox, их отправит следующий запуск.")
+            except Exception as e:
+                logging.error(f"Ошибка при досылке уведомлений при остановке: {e}")
+    finally:
+        try:
+            released = await release_notification_claims(worker_name())
+            if released:
+                logging.info(f"Вернул в очередь неотправленных уведомлений: {released}.")
+        except Exception as e:
+            logging.error(f"Не удалось вернуть уведомления в очередь: {e}")
+        await bot.session.close()
+        await close_db()
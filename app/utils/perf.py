@@ -0,0 +1,100 @@
+# app/utils/perf.py
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+from app.config import PERF_MONITOR_ENABLED, PERF_LAG_SAMPLE_INTERVAL, PERF_SLOW_CALLBACK_SEC
+
+logger = logging.getLogger(__name__)
+
+# Последние замеры задержки event loop (в секундах), ~5 минут при интервале 0.5 с
+LAG_SAMPLES = deque(maxlen=600)
+# Медленные колбэки: имя -> [количество, суммарное время, максимум]
+SLOW_CALLBACKS = {}
+
+_original_handle_run = asyncio.events.Handle._run
+_ASYNCIO_DIR = os.path.dirname(asyncio.__file__)
+_lag_task = None
+
+
+def _describe_callback(handle) -> str:
+    """
+    Возвращает читаемое имя колбэка. Для шага задачи - имя корутины задачи
+    и самой глубокой корутины, на которой она остановилась (там и была блокировка).
+    """
+    callback = handle._callback
+    task = getattr(callback, "__self__", None)
+    if not isinstance(task, asyncio.Task):
+        return getattr(callback, "__qualname__", repr(callback))
+
+    coro = task.get_coro()
+    outer = getattr(coro, "__qualname__", repr(coro))
+    inner = outer
+    while hasattr(getattr(coro, "cr_await", None), "cr_code"):
+        coro = coro.cr_await
+        # Служебные корутины asyncio (sleep, wait_for...) не интересны
+        if not coro.cr_code.co_filename.startswith(_ASYNCIO_DIR):
+            inner = coro.__qualname__
+    return outer if inner == outer else f"{outer} > {inner}"
+
+
+def _timed_handle_run(self):
+    """Замена Handle._run: выполняет колбэк и замеряет его длительность."""
+    start = time.perf_counter()
+    try:
+        return _original_handle_run(self)
+    finally:
+        duration = time.perf_counter() - start
+        if duration >= PERF_SLOW_CALLBACK_SEC:
+            _record_slow_callback(_describe_callback(self), duration)
+
+
+def _record_slow_callback(name: str, duration: float):
+    stats = SLOW_CALLBACKS.setdefault(name, [0, 0.0, 0.0])
+    stats[0] += 1
+    stats[1] += duration
+    stats[2] = max(stats[2], duration)
+    logger.warning("slow_callback name=%s duration_ms=%.1f", name, duration * 1000)
+
+
+async def _sample_loop_lag():
+    """Спит фиксированный интервал и записывает, на сколько loop опоздал с пробуждением."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(PERF_LAG_SAMPLE_INTERVAL)
+        lag = max(loop.time() - start - PERF_LAG_SAMPLE_INTERVAL, 0.0)
+        LAG_SAMPLES.append(lag)
+        if lag >= PERF_SLOW_CALLBACK_SEC:
+            logger.warning("loop_lag lag_ms=%.1f", lag * 1000)
+
+
+def start_perf_monitor():
+    """
+    Включает замер медленных колбэков и сэмплер задержки event loop.
+    Дешевле debug-режима asyncio, можно держать включенным в проде.
+    Вызывать из работающего event loop. Ничего не делает, если PERF_MONITOR_ENABLED выключен.
+    """
+    global _lag_task
+    if not PERF_MONITOR_ENABLED:
+        return
+    asyncio.events.Handle._run = _timed_handle_run
+    if _lag_task is None or _lag_task.done():
+        _lag_task = asyncio.get_running_loop().create_task(_sample_loop_lag())
+
+
+def get_lag_stats():
+    """Возвращает (среднее, p95, максимум) задержки loop в секундах или None, если замеров нет."""
+    if not LAG_SAMPLES:
+        return None
+    samples = sorted(LAG_SAMPLES)
+    p95 = samples[min(int(len(samples) * 0.95), len(samples) - 1)]
+    return sum(samples) / len(samples), p95, samples[-1]
+
+
+def get_top_slow_callbacks(limit: int = 10):
+    """Возвращает самые тяжелые колбэки по суммарному времени: [(имя, количество, сумма, максимум)]."""
+    top = sorted(SLOW_CALLBACKS.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+    return [(name, count, total, worst) for name, (count, total, worst) in top]
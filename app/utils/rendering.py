@@ -0,0 +1,130 @@
+# app/utils/rendering.py
+import re
+import time
+
+from app.config import RENDER_CACHE_TTL_SECONDS
+from app.db.database import (
+    get_data_version, get_current_week_schedule, get_average_ratings,
+    get_resident_stats, get_all_residents_stats,
+)
+
+# Кэш отрисованных ответов: имя вида -> (версия данных, время отрисовки, текст)
+_RENDER_CACHE = {}
+
+_MD_SPECIAL = re.compile(r"([_*`\[])")
+
+
+def escape_md(text) -> str:
+    """Экранирует спецсимволы Markdown (parse_mode="Markdown") вне сущностей."""
+    return _MD_SPECIAL.sub(r"\\\1", str(text))
+
+
+def bold_md(text) -> str:
+    """
+    Жирный текст в Markdown. Экранировать внутри сущности нельзя,
+    поэтому '*' выносится наружу: сущность закрывается и открывается заново.
+    """
+    return "*" + str(text).replace("*", "*\\**") + "*"
+
+
+def render_schedule(schedule_data) -> str:
+    lines = ["🗓️ *План уборки на текущую смену:*\n"]
+    for duty in schedule_data:
+        status_icon = "✅ Выполнено" if duty['is_completed'] else "❌ Не выполнено"
+        lines.append(f"{bold_md(duty['room_name'])}: {escape_md(duty['resident_name'])} ({status_icon})")
+    return "\n".join(lines) + "\n"
+
+
+def render_ratings(ratings) -> str:
+    lines = ["🏆 *Рейтинг качества уборок* 🏆\n"]
+    for r in ratings:
+        avg_rating = r['avg_rating'] if r['avg_rating'] is not None else 0
+        star_rating = "⭐" * int(round(avg_rating)) + "☆" * (5 - int(round(avg_rating)))
+        lines.append(f"{bold_md(r['name'])}: {avg_rating:.2f}/5.00 ({star_rating}) - *оценок: {r['total_ratings']}*")
+    return "\n".join(lines) + "\n"
+
+
+def _completion_rate(row) -> str:
+    return f"{row['completed']}/{row['assigned']} ({row['completed'] * 100 // row['assigned']}%)" if row['assigned'] else "0/0"
+
+
+def _avg_completion_time(row) -> str:
+    """Среднее время от начала смены до выполнения, например '2 д 5 ч'."""
+    if not row['timed_completions']:
+        return "—"
+    hours = row['completion_seconds'] // row['timed_completions'] // 3600
+    return f"{hours // 24} д {hours % 24} ч" if hours >= 24 else f"{hours} ч"
+
+
+def _avg_rating(row) -> str:
+    return f"{row['ratings_sum'] / row['ratings_count']:.2f} (оценок: {row['ratings_count']})" if row['ratings_count'] else "—"
+
+
+def render_resident_stats(stats) -> str:
+    totals, by_week = stats
+    title = bold_md(f"Статистика уборок: {totals['name']}")
+    lines = [f"📊 {title}\n"]
+    if not totals['assigned']:
+        lines.append("Пока нет ни одного дежурства.")
+        return "\n".join(lines)
+
+    distribution = " · ".join(f"{value}⭐ {totals[f'rating_{value}']}" for value in range(5, 0, -1))
+    lines += [
+        f"Выполнено дежурств: {_completion_rate(totals)}",
+        f"Среднее время до выполнения: {_avg_completion_time(totals)}",
+        f"Дней просрочки: {totals['overdue_days']}",
+        f"Средняя оценка: {_avg_rating(totals)}",
+        f"Оценки: {distribution}",
+        "\n*Последние смены:*",
+    ]
+    for week in by_week:
+        lines.append(f"• {week['week_start']}: {_completion_rate(week)}, оценка {_avg_rating(week)}")
+    return "\n".join(lines) + "\n"
+
+
+def render_all_stats(rows) -> str:
+    lines = ["📊 *Статистика уборок по жителям*\n"]
+    for r in rows:
+        lines.append(
+            f"{bold_md(r['name'])}: выполнено {_completion_rate(r)}, "
+            f"время {_avg_completion_time(r)}, просрочка {r['overdue_days']} дн., "
+            f"оценка {_avg_rating(r)}"
+        )
+    return "\n".join(lines) + "\n"
+
+
+async def _cached(view, load, render):
+    """
+    Возвращает отрисованный ответ из кэша, если данные с тех пор не менялись.
+    Иначе загружает данные, отрисовывает и кэширует. None - если данных нет.
+    """
+    version = get_data_version()
+    cached = _RENDER_CACHE.get(view)
+    if cached and cached[0] == version and time.monotonic() - cached[1] < RENDER_CACHE_TTL_SECONDS:
+        return cached[2]
+
+    data = await load()
+    text = render(data) if data else None
+    _RENDER_CACHE[view] = (version, time.monotonic(), text)
+    return text
+
+
+async def get_schedule_text():
+    """План уборки на текущую смену или None, если он еще не сформирован."""
+    return await _cached("schedule", get_current_week_schedule, render_schedule)
+
+
+async def get_ratings_text():
+    """Рейтинг качества уборок или None, если жителей нет."""
+    return await _cached("ratings", get_average_ratings, render_ratings)
+
+
+async def get_resident_stats_text(telegram_id):
+    """Статистика жителя по недельным сводкам или None, если он не зарегистрирован."""
+    stats = await get_resident_stats(telegram_id)
+    return render_resident_stats(stats) if stats else None
+
+
+async def get_all_stats_text():
+    """Статистика по всем жителям (для админа) или None, если жителей нет."""
+    return await _cached("stats", get_all_residents_stats, render_all_stats)
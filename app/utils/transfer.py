@@ -0,0 +1,158 @@
+# app/utils/transfer.py
+"""
+Потоковый импорт/экспорт таблиц в CSV и JSON Lines (одна JSON-строка на запись).
+Строки идут генератором порциями по BULK_CHUNK_SIZE, поэтому память не зависит
+от размера таблицы. Используется командами /admin_export, /admin_import и manage.py.
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+from datetime import date, datetime, timezone
+
+from app.config import BULK_CHUNK_SIZE
+from app.db.database import BULK_TABLES, iter_table_rows, import_table_rows
+
+FORMATS = ("csv", "jsonl")
+
+
+def guess_format(path: str) -> str:
+    """Формат по расширению файла (.csv или .jsonl/.json)."""
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    return "jsonl" if extension in ("jsonl", "json") else "csv"
+
+
+# --- Преобразование значений ---
+
+def _to_plain(value, column_type):
+    """Значение из БД -> значение для файла (SQLite и PostgreSQL отдают типы по-разному)."""
+    if value is None:
+        return None
+    if column_type == "bool":
+        return bool(value)
+    if column_type in ("date", "timestamp") and not isinstance(value, str):
+        return value.isoformat(" ", "seconds") if isinstance(value, datetime) else value.isoformat()
+    return value
+
+
+def _from_plain(value, column_type):
+    """Значение из файла (строка CSV или значение JSON) -> значение для записи в БД."""
+    if value is None or value == "":
+        return None
+    if column_type == "int":
+        return int(value)
+    if column_type == "bool":
+        return value if isinstance(value, bool) else str(value).strip().lower() in ("1", "true", "t", "yes")
+    if column_type == "date":
+        return date.fromisoformat(value)
+    if column_type == "timestamp":
+        return datetime.fromisoformat(value)
+    return str(value)
+
+
+# --- Экспорт ---
+
+def read_marker(marker_path):
+    """Читает маркер инкрементального экспорта или возвращает None, если его еще нет."""
+    if not marker_path or not os.path.exists(marker_path):
+        return None
+    with open(marker_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+async def export_table(table, fmt, output_path, marker_path=None):
+    """
+    Экспортирует таблицу в файл. Если передан marker_path, экспорт инкрементальный:
+    выгружаются только строки с id больше, чем в прошлый раз, а после успешной
+    выгрузки маркер обновляется (last_id и ETag - хеш выгруженного по цепочке с прошлым).
+    Инкрементальный экспорт ловит только новые строки, изменения старых в него не попадают.
+    Возвращает число выгруженных строк.
+    """
+    if table not in BULK_TABLES:
+        raise ValueError(f"Неизвестная таблица: {table}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат: {fmt}")
+
+    columns = BULK_TABLES[table]
+    marker = read_marker(marker_path)
+    if marker and marker.get("table") != table:
+        raise ValueError(f"Маркер {marker_path} относится к таблице {marker.get('table')}, а не {table}")
+    last_id = marker["last_id"] if marker else 0
+    etag = hashlib.sha256((marker["etag"] if marker else "").encode())
+
+    count = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    with open(output_path, "w", encoding="utf-8", newline="") as f:
+        if writer:
+            writer.writerow([name for name, _ in columns])
+
+        async for row in iter_table_rows(table, after_id=last_id):
+            values = [_to_plain(row[i], column_type) for i, (_, column_type) in enumerate(columns)]
+            if writer:
+                writer.writerow(values)
+            else:
+                buffer.write(json.dumps(dict(zip((name for name, _ in columns), values)), ensure_ascii=False) + "\n")
+            last_id = row[0]
+            count += 1
+            # Сбрасываем буфер на диск порциями, а не по строке
+            if count % BULK_CHUNK_SIZE == 0:
+                chunk = buffer.getvalue()
+                etag.update(chunk.encode())
+                f.write(chunk)
+                buffer.seek(0)
+                buffer.truncate()
+
+        chunk = buffer.getvalue()
+        etag.update(chunk.encode())
+        f.write(chunk)
+
+    if marker_path:
+        with open(marker_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "table": table,
+                "last_id": last_id,
+                "rows": count,
+                "etag": etag.hexdigest(),
+                "exported_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            }, f, ensure_ascii=False, indent=2)
+    return count
+
+
+# --- Импорт ---
+
+def _read_rows(table, fmt, f):
+    """Генератор кортежей значений из файла в порядке колонок таблицы."""
+    columns = BULK_TABLES[table]
+    records = csv.DictReader(f) if fmt == "csv" else (json.loads(line) for line in f if line.strip())
+    for record in records:
+        missing = [name for name, _ in columns if name not in record]
+        if missing:
+            # Иначе при обновлении по id недостающие колонки затерлись бы NULL
+            raise ValueError(f"В строке не хватает колонок {', '.join(missing)}: {record}")
+        yield tuple(_from_plain(record[name], column_type) for name, column_type in columns)
+
+
+async def import_table(table, fmt, input_path):
+    """
+    Импортирует строки из файла: вставляет новые и обновляет существующие по id.
+    Каждая порция из BULK_CHUNK_SIZE строк - отдельная транзакция.
+    Возвращает число импортированных строк.
+    """
+    if table not in BULK_TABLES:
+        raise ValueError(f"Неизвестная таблица: {table}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат: {fmt}")
+
+    count = 0
+    chunk = []
+    with open(input_path, encoding="utf-8", newline="") as f:
+        for values in _read_rows(table, fmt, f):
+            chunk.append(values)
+            if len(chunk) >= BULK_CHUNK_SIZE:
+                count += await import_table_rows(table, chunk)
+                chunk = []
+    if chunk:
+        count += await import_table_rows(table, chunk)
+    return count
@@ -0,0 +1,181 @@
+# app/workers.py
+"""
+Многопроцессный режим (WORKER_COUNT > 1).
+
+Telegram отдает апдейты только одному getUpdates, поэтому опрос ведет родительский
+процесс-маршрутизатор: он раскладывает апдейты по очередям воркеров по chat_id
+(см. app/sharding.py), так что все апдейты одного чата обрабатывает один воркер.
+Каждый воркер - отдельный процесс со своим диспетчером и планировщиком;
+задачи планировщика берут аренду в БД (app/scheduler/locks.py).
+
+Маршрутизатор следит за воркерами и перезапускает упавшие: их апдейты тем временем
+копятся в очереди и достаются новому процессу, а не теряются.
+
+По SIGTERM/SIGINT маршрутизатор перестает опрашивать Telegram и шлет воркерам
+сигнал остановки, а воркеры дорабатывают как и одиночный бот (app/shutdown.py).
+"""
+import asyncio
+import logging
+import multiprocessing
+import queue as queue_module
+import signal
+import time
+from contextlib import suppress
+
+from app.bot import create_bot, create_dispatcher, create_initial_schedule, resume_notifications, start_scheduler
+from app.config import SHUTDOWN_TIMEOUT_SECONDS
+from app.db.database import initialize_db
+from app.sharding import configure_worker, shard_for_chat
+from app.shutdown import graceful_shutdown, track
+from app.utils.perf import start_perf_monitor
+
+# Воркер ждет апдейт не дольше этого, чтобы вовремя заметить сигнал остановки
+_QUEUE_POLL_SECONDS = 1
+# Как часто маршрутизатор проверяет, живы ли воркеры. Заодно это пауза перед
+# перезапуском, чтобы воркер, падающий при старте (например, БД недоступна), не крутился впустую
+_WORKER_CHECK_SECONDS = 5
+# Запас сверх SHUTDOWN_TIMEOUT_SECONDS на остановку воркера: ожидание очереди, возврат уведомлений, закрытие БД
+_WORKER_STOP_GRACE_SECONDS = 5
+
+
+def _update_chat_id(update) -> int:
+    """chat_id апдейта для шардирования; для апдейтов без чата - id пользователя."""
+    event = update.event
+    chat = getattr(event, "chat", None) or getattr(getattr(event, "message", None), "chat", None)
+    if chat is not None:
+        return chat.id
+    user = getattr(event, "from_user", None)
+    return user.id if user is not None else 0
+
+
+def _stop_on_signals(stop: asyncio.Event):
+    """SIGTERM и SIGINT выставляют stop вместо немедленного завершения процесса."""
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        with suppress(NotImplementedError):  # Windows
+            loop.add_signal_handler(sig, stop.set)
+
+
+async def _poll_updates(bot, queues):
+    await bot.delete_webhook(drop_pending_updates=True)
+    offset = None
+    while True:
+        try:
+            updates = await bot.get_updates(offset=offset, timeout=30)
+        except Exception as e:
+            logging.error(f"Ошибка при получении апдейтов: {e}")
+            await asyncio.sleep(1)
+            continue
+        for update in updates:
+            offset = update.update_id + 1
+            shard = shard_for_chat(_update_chat_id(update), len(queues))
+            queues[shard].put(update.model_dump(mode="json", exclude_none=True, by_alias=True))
+
+
+async def _watch_workers(processes, start_worker):
+    """Перезапускает завершившиеся процессы воркеров (processes меняется на месте)."""
+    while True:
+        await asyncio.sleep(_WORKER_CHECK_SECONDS)
+        for worker_id, process in enumerate(processes):
+            if not process.is_alive():
+                logging.error(f"Воркер {worker_id} завершился (код {process.exitcode}), перезапускаю.")
+                processes[worker_id] = start_worker(worker_id)
+
+
+async def route_updates(queues, processes, start_worker):
+    """
+    Опрашивает Telegram и раскладывает апдейты по очередям воркеров до сигнала остановки,
+    перезапуская упавших воркеров через start_worker(worker_id).
+    """
+    bot = create_bot()
+    stop = asyncio.Event()
+    _stop_on_signals(stop)
+    polling = asyncio.create_task(_poll_updates(bot, queues))
+    watching = asyncio.create_task(_watch_workers(processes, start_worker))
+    stopping = asyncio.create_task(stop.wait())
+    try:
+        await asyncio.wait({polling, watching, stopping}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        polling.cancel()
+        watching.cancel()
+        stopping.cancel()
+        try:
+            with suppress(asyncio.CancelledError):
+                await polling
+        finally:
+            await bot.session.close()
+
+
+_NO_UPDATE = object()
+
+
+def _next_update(queue):
+    """Следующий апдейт из очереди, None - сигнал остановки, _NO_UPDATE - очередь пока пуста."""
+    try:
+        return queue.get(timeout=_QUEUE_POLL_SECONDS)
+    except queue_module.Empty:
+        return _NO_UPDATE
+
+
+async def _worker_main(queue):
+    start_perf_monitor()
+    await initialize_db()
+
+    bot = create_bot()
+    dp = create_dispatcher()
+    await create_initial_schedule(bot)
+    await resume_notifications(bot)
+    scheduler = start_scheduler(bot)
+
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    _stop_on_signals(stop)
+    try:
+        while not stop.is_set():
+            raw_update = await loop.run_in_executor(None, _next_update, queue)
+            if raw_update is None:
+                break
+            if raw_update is not _NO_UPDATE:
+                # track держит ссылку на задачу и дает остановке ее дождаться
+                track(asyncio.create_task(dp.feed_raw_update(bot, raw_update)))
+    finally:
+        await graceful_shutdown(bot, scheduler)
+
+
+def run_worker(worker_id: int, worker_count: int, queue):
+    """Точка входа процесса-воркера."""
+    logging.basicConfig(level=logging.INFO, format=f"[worker {worker_id}] %(levelname)s:%(name)s:%(message)s")
+    configure_worker(worker_id, worker_count)
+    try:
+        asyncio.run(_worker_main(queue))
+    except KeyboardInterrupt:
+        pass
+
+
+def run_workers(worker_count: int):
+    """Запускает worker_count процессов-воркеров и маршрутизатор апдейтов в текущем процессе."""
+    ctx = multiprocessing.get_context("spawn")
+    queues = [ctx.Queue() for _ in range(worker_count)]
+
+    def start_worker(worker_id):
+        process = ctx.Process(target=run_worker, args=(worker_id, worker_count, queues[worker_id]),
+                              name=f"worker-{worker_id}")
+        process.start()
+        return process
+
+    processes = [start_worker(worker_id) for worker_id in range(worker_count)]
+    logging.info(f"Запущено воркеров: {worker_count}.")
+
+    try:
+        asyncio.run(route_updates(queues, processes, start_worker))
+    finally:
+        for queue in queues:
+            queue.put(None)
+        # Воркеры останавливаются параллельно (app/shutdown.py); не успевшие завершаются принудительно
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT_SECONDS + _WORKER_STOP_GRACE_SECONDS
+        for process in processes:
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                logging.error(f"Воркер {process.name} не остановился вовремя, завершаю принудительно.")
+                process.terminate()
+                process.join()
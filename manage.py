@@ -0,0 +1,51 @@
+# manage.py
+"""
+Консольные команды администрирования.
+
+    python manage.py export schedule schedule.csv
+    python manage.py export ratings ratings.jsonl --marker ratings.marker.json
+    python manage.py import residents residents.csv
+"""
+import argparse
+import asyncio
+import logging
+
+from app.db.database import initialize_db, close_db, BULK_TABLES
+from app.utils.transfer import FORMATS, export_table, import_table, guess_format
+
+logging.basicConfig(level=logging.INFO)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Администрирование бота дежурств")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Выгрузить таблицу в файл")
+    export_parser.add_argument("table", choices=BULK_TABLES)
+    export_parser.add_argument("output")
+    export_parser.add_argument("--format", choices=FORMATS, help="По умолчанию - по расширению файла")
+    export_parser.add_argument("--marker", help="Файл маркера для инкрементального экспорта (только новые строки)")
+
+    import_parser = commands.add_parser("import", help="Загрузить строки из файла (вставка/обновление по id)")
+    import_parser.add_argument("table", choices=BULK_TABLES)
+    import_parser.add_argument("input")
+    import_parser.add_argument("--format", choices=FORMATS, help="По умолчанию - по расширению файла")
+
+    return parser.parse_args()
+
+
+async def main(args):
+    await initialize_db()
+    try:
+        if args.command == "export":
+            count = await export_table(args.table, args.format or guess_format(args.output), args.output, args.marker)
+            logging.info(f"Выгружено строк из {args.table}: {count}.")
+        else:
+            count = await import_table(args.table, args.format or guess_format(args.input), args.input)
+            logging.info(f"Загружено строк в {args.table}: {count}.")
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
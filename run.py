@@ -1,64 +1,50 @@
 # run.py
 import asyncio
 import logging
-from aiogram import Bot, Dispatcher
-from aiogram.client.default import DefaultBotProperties  # Добавляем импорт
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
-from app.config import BOT_TOKEN, DUTY_CYCLE_WEEKS
-# Импортируем новую функцию
-from app.db.database import initialize_db, is_schedule_empty
-from app.handlers import common, registration, callbacks, admin
-# Импортируем assign_duties для вызова при старте
-from app.scheduler.tasks import assign_duties, send_reminders, send_overdue_reminders
+from app.config import WORKER_COUNT
+from app.db.database import initialize_db
+from app.bot import create_bot, create_dispatcher, create_initial_schedule, resume_notifications, start_scheduler
+from app.shutdown import graceful_shutdown
+from app.utils.perf import start_perf_monitor
+from app.workers import run_workers
 
 logging.basicConfig(level=logging.INFO)
 
 async def main():
+    # Замер задержки event loop и медленных колбэков (см. /admin_perf)
+    start_perf_monitor()
+
     # Инициализация базы данных
     await initialize_db()
 
     # Инициализация бота и диспетчера
-    # Устанавливаем parse_mode через DefaultBotProperties
-    bot = Bot(
-        token=BOT_TOKEN,
-        default=DefaultBotProperties(parse_mode="Markdown")  # Новый способ
-    )
-    dp = Dispatcher()
-
-    # --- Первичное создание расписания при запуске ---
-    if await is_schedule_empty():
-        logging.info("База данных расписаний пуста. Создаю первоначальный план уборки...")
-        try:
-            await assign_duties(bot)
-            logging.info("Первоначальный план уборки успешно создан.")
-        except Exception as e:
-            logging.error(f"Не удалось создать первоначальный план уборки: {e}")
-    # ---------------------------------------------------
+    bot = create_bot()
+    dp = create_dispatcher()
 
-    # Подключение роутеров
+    # Первичное создание расписания при запуске
+    await create_initial_schedule(bot)
 
-    dp.include_router(common.router)
-    dp.include_router(callbacks.router)
- 
-    dp.include_router(admin.router)
-    dp.include_router(registration.router)
+    # Досылаем уведомления, прерванные прошлой остановкой
+    await resume_notifications(bot)
 
     # Настройка и запуск планировщика
-    scheduler = AsyncIOScheduler(timezone="Europe/Moscow")
-    
-    scheduler.add_job(assign_duties, 'cron', day_of_week='mon', hour=10, minute=0, week=f'*/{DUTY_CYCLE_WEEKS}', args=(bot,))
-    scheduler.add_job(send_reminders, 'cron', day_of_week='mon,wed,sun', hour=12, minute=0, args=(bot,))
-    scheduler.add_job(send_overdue_reminders, 'cron', hour='9,15,21', minute=0, args=(bot,))
+    scheduler = start_scheduler(bot)
 
-    scheduler.start()
-
-    # Запуск бота
-    await bot.delete_webhook(drop_pending_updates=True)
-    await dp.start_polling(bot)
+    # Запуск бота. По SIGTERM/SIGINT aiogram останавливает опрос; сессию бота
+    # закрываем сами - она нужна обработчикам, которые еще дорабатывают
+    try:
+        await bot.delete_webhook(drop_pending_updates=True)
+        await dp.start_polling(bot, close_bot_session=False)
+    finally:
+        await graceful_shutdown(bot, scheduler)
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        if WORKER_COUNT > 1:
+            # Несколько процессов: апдейты делятся по chat_id, задачи планировщика - по аренде в БД
+            run_workers(WORKER_COUNT)
+        else:
+            asyncio.run(main())
     except (KeyboardInterrupt, SystemExit):
-        logging.info("Бот остановлен.")
\ No newline at end of file
+        logging.info("Бот остановлен.")
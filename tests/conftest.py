@@ -0,0 +1,120 @@
+# tests/conftest.py
+"""
+Общие фикстуры. Тесты БД гоняются на обоих бэкендах: SQLite во временном файле
+и PostgreSQL. Сервер PostgreSQL берется из DATABASE_URL, а без него тесты сами
+поднимают временный локальный сервер через pgserver или testing.postgresql
+(pip install pgserver); если нет ни того, ни другого, случаи PostgreSQL пропускаются.
+Для PostgreSQL каждый тест получает свою схему, которая удаляется после теста,
+так что чужие таблицы в базе DATABASE_URL не трогаются.
+
+Запуск: python -m pytest -q
+"""
+import asyncio
+import os
+import uuid
+
+import pytest
+
+from app.db import database
+from app.db.backends.sqlite import SqliteBackend
+
+
+@pytest.fixture(scope="session")
+def postgres_url(tmp_path_factory):
+    """DSN сервера PostgreSQL для тестов: DATABASE_URL или временный локальный сервер."""
+    url = os.getenv("DATABASE_URL")
+    if url:
+        yield url
+        return
+    try:
+        import pgserver
+    except ImportError:
+        pgserver = None
+    if pgserver is not None:
+        server = pgserver.get_server(tmp_path_factory.mktemp("pgdata"), cleanup_mode="delete")
+        try:
+            yield server.get_uri()
+        finally:
+            server.cleanup()
+        return
+    try:
+        import testing.postgresql
+    except ImportError:
+        pytest.skip("Нет DATABASE_URL, pgserver и testing.postgresql - тесты PostgreSQL пропущены")
+    server = testing.postgresql.Postgresql()
+    try:
+        yield server.url()
+    finally:
+        server.stop()
+
+
+def _postgres_backend(url):
+    import asyncpg
+    from app.db.backends.postgres import PostgresBackend
+
+    schema = f"dorm_duty_test_{uuid.uuid4().hex[:12]}"
+
+    async def execute(sql):
+        conn = await asyncpg.connect(url)
+        try:
+            await conn.execute(sql)
+        finally:
+            await conn.close()
+
+    asyncio.run(execute(f"CREATE SCHEMA {schema}"))
+    # Неизвестные параметры DSN asyncpg передает серверу как настройки сессии
+    separator = "&" if "?" in url else "?"
+    backend = PostgresBackend(f"{url}{separator}search_path={schema}")
+    return backend, lambda: asyncio.run(execute(f"DROP SCHEMA {schema} CASCADE"))
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def backend(request, tmp_path, monkeypatch):
+    """Бэкенд, через который идут все функции app/db/database.py в тесте."""
+    if request.param == "sqlite":
+        backend, cleanup = SqliteBackend(str(tmp_path / "test.db")), None
+    else:
+        backend, cleanup = _postgres_backend(request.getfixturevalue("postgres_url"))
+    monkeypatch.setattr(database, "_backend", backend)
+    yield backend
+    if cleanup:
+        cleanup()
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path, monkeypatch):
+    """Только SQLite - для тестов группового писателя."""
+    backend = SqliteBackend(str(tmp_path / "test.db"))
+    monkeypatch.setattr(database, "_backend", backend)
+    return backend
+
+
+def _runner():
+    def run(scenario):
+        async def main():
+            await database.initialize_db()
+            try:
+                return await scenario()
+            finally:
+                await database.close_db()
+        return asyncio.run(main())
+    return run
+
+
+@pytest.fixture
+def run_db(backend):
+    """Выполняет async-сценарий в одном event loop между initialize_db и close_db."""
+    return _runner()
+
+
+@pytest.fixture
+def run_sqlite(sqlite_backend):
+    return _runner()
+
+
+async def register_all():
+    """Регистрирует всех жителей с telegram_id = 1000 + id и возвращает их ID."""
+    resident_ids = await database.get_all_resident_ids()
+    for resident_id in resident_ids:
+        await database.register_user(resident_id, 1000 + resident_id)
+    return resident_ids
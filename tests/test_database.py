@@ -0,0 +1,211 @@
+# tests/test_database.py
+"""Общие для SQLite и PostgreSQL проверки функций app/db/database.py."""
+import asyncio
+from datetime import date, timedelta
+
+from app.config import RESIDENTS, ROOMS
+from app.db import database
+from app.scheduler.tasks import _parse_digest
+from tests.conftest import register_all
+
+
+async def _fetchall(sql, params=()):
+    async with database._backend.read() as db:
+        return [tuple(row) for row in await db.fetchall(sql, params)]
+
+
+async def _rollups():
+    return await _fetchall("SELECT * FROM weekly_rollups ORDER BY week_start, resident_id, room_id")
+
+
+async def _rebuild_rollups():
+    async def op(db):
+        await database._rebuild_rollups(db)
+    await database._write(op)
+
+
+def test_initialize_db_twice(run_db):
+    async def scenario():
+        await database.initialize_db()
+        residents = await _fetchall("SELECT name FROM residents")
+        rooms = await _fetchall("SELECT name FROM rooms")
+        assert sorted(name for name, in residents) == sorted(RESIDENTS)
+        assert sorted(name for name, in rooms) == sorted(ROOMS)
+    run_db(scenario)
+
+
+def test_concurrent_initialize_backfills_rollups_once(run_db):
+    async def scenario():
+        resident_ids = await register_all()
+        rooms = await database.get_all_rooms()
+        for i, room in enumerate(rooms):
+            schedule_id = await database.add_schedule_entry(resident_ids[i], room['id'], date.today() - timedelta(days=9))
+            await database.complete_duty(schedule_id)
+        expected = await _rollups()
+
+        # Как при первом запуске с аналитикой: история есть, сводок нет, воркеры стартуют вместе
+        async def op(db):
+            await db.execute("DELETE FROM weekly_rollups")
+        await database._write(op)
+        await asyncio.gather(*(database.initialize_db() for _ in range(3)))
+        assert await _rollups() == expected
+    run_db(scenario)
+
+
+def test_add_schedule_entry_returns_ids(run_db):
+    async def scenario():
+        rooms = await database.get_all_rooms()
+        resident_ids = await database.get_all_resident_ids()
+        today = date.today()
+        ids = [await database.add_schedule_entry(resident_ids[i], room['id'], today) for i, room in enumerate(rooms)]
+        assert len(set(ids)) == len(rooms)
+        assert all(isinstance(schedule_id, int) for schedule_id in ids)
+        assert len(await database.get_current_week_schedule()) == len(rooms)
+        assert await database.get_latest_schedule_date() == today
+    run_db(scenario)
+
+
+def test_replace_schedule_replaces_shift(run_db):
+    async def scenario():
+        resident_ids = await register_all()
+        rooms = await database.get_all_rooms()
+        today = date.today()
+        assignments = [(resident_ids[i], room['id'], 1000 + resident_ids[i]) for i, room in enumerate(rooms)]
+
+        first = await database.replace_schedule(today, assignments, resident_ids)
+        second = await database.replace_schedule(today, assignments, resident_ids)
+        assert len(first) == len(second) == len(rooms)
+        assert not set(first) & set(second)
+
+        schedule = await _fetchall("SELECT id FROM schedule WHERE week_start_date = ?", (today,))
+        assert sorted(schedule_id for schedule_id, in schedule) == sorted(second)
+        # Уведомления о назначении есть для обеих смен; первые устарели вместе с записями
+        outbox = await _fetchall("SELECT schedule_id FROM outbox WHERE kind = 'assignment'")
+        assert sorted(schedule_id for schedule_id, in outbox) == sorted(first + second)
+        # Статистика жителей обновлена в той же транзакции
+        unassigned = set(resident_ids) - {resident_id for resident_id, _, _ in assignments}
+        for resident_id in unassigned:
+            row = await _fetchall("SELECT consecutive_cleanings FROM residents WHERE id = ?", (resident_id,))
+            assert row == [(0,)]
+    run_db(scenario)
+
+
+def test_complete_duty_is_idempotent(run_db):
+    async def scenario():
+        resident_ids = await register_all()
+        room = (await database.get_all_rooms())[0]
+        schedule_id = await database.add_schedule_entry(resident_ids[0], room['id'], date.today())
+
+        rating_requests = await database.complete_duty(schedule_id)
+        assert len(rating_requests) == len(resident_ids) - 1
+        assert await database.complete_duty(schedule_id) == []
+
+        duty = await _fetchall("SELECT is_completed, next_reminder_at FROM schedule WHERE id = ?", (schedule_id,))
+        assert bool(duty[0][0]) and duty[0][1] is None
+        rollup = await _fetchall("SELECT assigned, completed, timed_completions FROM weekly_rollups")
+        assert rollup == [(1, 1, 1)]
+    run_db(scenario)
+
+
+def test_digest_queries_keep_ids_and_rooms_aligned(run_db):
+    async def scenario():
+        resident_ids = await register_all()
+        rooms = await database.get_all_rooms()
+        resident_id = resident_ids[0]
+        today = date.today()
+        current = {await database.add_schedule_entry(resident_id, room['id'], today): room['name'] for room in rooms}
+        overdue_week = today - timedelta(days=10)
+        overdue = {await database.add_schedule_entry(resident_id, room['id'], overdue_week): room['name'] for room in rooms}
+
+        digests = await database.get_uncompleted_duties_digest()
+        assert len(digests) == 1
+        assert digests[0]['telegram_id'] == 1000 + resident_id
+        assert _parse_digest(digests[0]) == sorted(current.items(), key=lambda duty: duty[1])
+
+        digests = await database.get_overdue_duties_digest()
+        assert len(digests) == 1
+        assert _parse_digest(digests[0]) == sorted(overdue.items(), key=lambda duty: duty[1])
+        assert digests[0]['reminder_level'] == 0
+
+        await database.mark_overdue_reminded(list(overdue))
+        assert await database.get_overdue_duties_digest() == []
+    run_db(scenario)
+
+
+def test_acquire_job_lease_contention(run_db):
+    async def scenario():
+        results = await asyncio.gather(*(
+            database.acquire_job_lease("job:slot", f"worker-{i}", 60) for i in range(5)
+        ))
+        assert sorted(results) == [False] * 4 + [True]
+        winner = f"worker-{results.index(True)}"
+        # Свою действующую аренду повторно взять нельзя
+        assert not await database.acquire_job_lease("job:slot", winner, 60)
+        # Истекшую аренду забирает другой воркер
+        assert await database.acquire_job_lease("job:expired", "worker-0", -1)
+        assert await database.acquire_job_lease("job:expired", "worker-1", 60)
+    run_db(scenario)
+
+
+def test_rollups_match_rebuild(run_db):
+    async def scenario():
+        resident_ids = await register_all()
+        rooms = await database.get_all_rooms()
+        today = date.today()
+        late = await database.add_schedule_entry(resident_ids[0], rooms[0]['id'], today - timedelta(days=9))
+        open_overdue = await database.add_schedule_entry(resident_ids[1], rooms[1]['id'], today - timedelta(days=9))
+        current = await database.add_schedule_entry(resident_ids[2], rooms[2]['id'], today)
+
+        await database.count_overdue_days()
+        await database.count_overdue_days()
+        await database.complete_duty(late)
+        await database.complete_duty(current)
+        await database.save_rating(late, 1, 5)
+        await database.save_rating(late, 2, 3)
+
+        incremental = await _rollups()
+        await _rebuild_rollups()
+        assert await _rollups() == incremental
+
+        stats = await database.get_resident_stats(1000 + resident_ids[0])
+        totals, by_week = stats
+        assert (totals['assigned'], totals['completed'], totals['overdue_days']) == (1, 1, 3)
+        assert (totals['ratings_count'], totals['ratings_sum'], totals['rating_5'], totals['rating_3']) == (2, 8, 1, 1)
+        assert len(by_week) == 1
+
+        by_name = {row['name']: row for row in await database.get_all_residents_stats()}
+        open_resident = (await _fetchall("SELECT name FROM residents WHERE id = ?", (resident_ids[1],)))[0][0]
+        assert by_name[open_resident]['completed'] == 0
+        assert by_name[open_resident]['overdue_days'] == 3
+        assert open_overdue
+    run_db(scenario)
+
+
+def test_import_table_rows_syncs_id_sequence(run_db):
+    async def scenario():
+        resident_ids = await database.get_all_resident_ids()
+        rooms = await database.get_all_rooms()
+        week = date.today() - timedelta(days=14)
+        rows = [
+            (100 + i, resident_ids[i], room['id'], week, False, 0, None, None, None)
+            for i, room in enumerate(rooms)
+        ]
+        assert await database.import_table_rows("schedule", rows) == len(rows)
+        assert await database.import_table_rows("ratings", [(50, 100, 1, 4)]) == 1
+
+        # Новые записи не должны столкнуться с импортированными id
+        new_id = await database.add_schedule_entry(resident_ids[0], rooms[0]['id'], date.today())
+        assert new_id > 100 + len(rooms) - 1
+
+        exported = [tuple(row) async for row in database.iter_table_rows("schedule", chunk_size=2)]
+        assert [row[0] for row in exported] == sorted(row[0] for row in exported)
+        assert len(exported) == len(rows) + 1
+
+        # Повторный импорт обновляет строки по id, а сводки пересчитываются
+        updated = [row[:4] + (True,) + row[5:] for row in rows]
+        await database.import_table_rows("schedule", updated)
+        rollup = await _fetchall(
+            "SELECT SUM(assigned), SUM(completed), SUM(ratings_count) FROM weekly_rollups WHERE week_start = ?", (week,)
+        )
+        assert rollup == [(len(rows), len(rows), 1)]
+    run_db(scenario)
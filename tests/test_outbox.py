@@ -0,0 +1,124 @@
+# tests/test_outbox.py
+"""Очередь уведомлений (outbox) и корректная остановка (app/shutdown.py)."""
+import asyncio
+from datetime import date
+
+from app import shutdown
+from app.db import database
+from tests.conftest import register_all
+
+
+async def _enqueue_notifications():
+    """Смена с уведомлениями о назначении и просьбы оценить одно из дежурств. Возвращает id всех уведомлений."""
+    resident_ids = await register_all()
+    rooms = await database.get_all_rooms()
+    assignments = [(resident_ids[i], room['id'], 1000 + resident_ids[i]) for i, room in enumerate(rooms)]
+    schedule_ids = await database.replace_schedule(date.today(), assignments, resident_ids)
+    await database.complete_duty(schedule_ids[0])
+    async with database._backend.read() as db:
+        return sorted(row[0] for row in await db.fetchall("SELECT id FROM outbox"))
+
+
+class _FakeSession:
+    closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class _FakeBot:
+    def __init__(self):
+        self.sent = []
+        self.session = _FakeSession()
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+class _FakeScheduler:
+    stopped = False
+
+    def shutdown(self, wait=True):
+        self.stopped = True
+
+
+def test_two_holders_claim_disjoint_rows(run_db):
+    async def scenario():
+        all_ids = await _enqueue_notifications()
+        half = len(all_ids) // 2 + 1
+        first, second = await asyncio.gather(
+            database.claim_notifications("worker-a", 60, limit=half),
+            database.claim_notifications("worker-b", 60, limit=half),
+        )
+        first_ids = {row['id'] for row in first}
+        second_ids = {row['id'] for row in second}
+        assert not first_ids & second_ids
+        assert first_ids | second_ids == set(all_ids)
+        assert await database.claim_notifications("worker-c", 60) == []
+    run_db(scenario)
+
+
+def test_claim_only_listed_ids(run_db):
+    async def scenario():
+        all_ids = await _enqueue_notifications()
+        claimed = await database.claim_notifications("worker-a", 60, ids=all_ids[:2])
+        assert [row['id'] for row in claimed] == all_ids[:2]
+        assert await database.claim_notifications("worker-a", 60, ids=[]) == []
+    run_db(scenario)
+
+
+def test_release_hands_rows_back(run_db):
+    async def scenario():
+        all_ids = await _enqueue_notifications()
+        claimed = await database.claim_notifications("worker-a", 60)
+        assert [row['id'] for row in claimed] == all_ids
+        assert await database.claim_notifications("worker-b", 60) == []
+
+        await database.mark_notification_sent(all_ids[0])
+        assert await database.release_notification_claims("worker-a") == len(all_ids) - 1
+
+        # Отправленное не возвращается, остальное сразу доступно другому воркеру
+        reclaimed = await database.claim_notifications("worker-b", 60)
+        assert [row['id'] for row in reclaimed] == all_ids[1:]
+    run_db(scenario)
+
+
+def test_expired_claim_is_taken_over(run_db):
+    async def scenario():
+        all_ids = await _enqueue_notifications()
+        await database.claim_notifications("crashed-worker", -1)
+        reclaimed = await database.claim_notifications("worker-b", 60)
+        assert [row['id'] for row in reclaimed] == all_ids
+    run_db(scenario)
+
+
+def test_drain_in_flight_cancels_work_past_deadline():
+    async def scenario():
+        async def work(seconds):
+            async with shutdown.in_flight():
+                await asyncio.sleep(seconds)
+
+        fast = asyncio.create_task(work(0.01))
+        slow = asyncio.create_task(work(10))
+        tracked = shutdown.track(asyncio.create_task(asyncio.sleep(10)))
+        await asyncio.sleep(0)  # Задачи входят в in_flight
+
+        assert await shutdown._drain_in_flight(0.2) == 2
+        assert fast.done() and not fast.cancelled()
+        assert slow.cancelled() and tracked.cancelled()
+        assert not shutdown._in_flight
+    asyncio.run(scenario())
+
+
+def test_graceful_shutdown_flushes_outbox(run_db):
+    async def scenario():
+        all_ids = await _enqueue_notifications()
+        bot, scheduler = _FakeBot(), _FakeScheduler()
+
+        await shutdown.graceful_shutdown(bot, scheduler)
+
+        assert scheduler.stopped and bot.session.closed
+        assert len(bot.sent) == len(all_ids)
+        # Повторная досылка ничего не отправляет
+        assert await database.claim_notifications("worker-b", 60) == []
+    run_db(scenario)
@@ -0,0 +1,68 @@
+# tests/test_reminders.py
+"""Волны напоминаний-дайджестов (app/scheduler/tasks.py) с подставным ботом."""
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from aiogram.exceptions import TelegramBadRequest
+
+from app.db import database
+from app.scheduler import tasks
+from tests.conftest import register_all
+
+
+class _FakeBot:
+    """Запоминает отправки и правки; как Telegram, отказывается править сообщение без изменений."""
+
+    def __init__(self):
+        self.messages = {}
+        self.sent = []
+        self.edited = []
+
+    async def send_message(self, chat_id, text, reply_markup=None, **kwargs):
+        message_id = len(self.sent) + 1
+        self.sent.append((chat_id, text))
+        self.messages[message_id] = (text, reply_markup)
+        return SimpleNamespace(message_id=message_id)
+
+    async def edit_message_text(self, chat_id, message_id, text, reply_markup=None, **kwargs):
+        if self.messages[message_id] == (text, reply_markup):
+            raise TelegramBadRequest(method=None, message="Bad Request: message is not modified")
+        self.edited.append((chat_id, text))
+        self.messages[message_id] = (text, reply_markup)
+
+
+def _days_later(days):
+    class _Date(date):
+        @classmethod
+        def today(cls):
+            return date.today() + timedelta(days=days)
+    return _Date
+
+
+async def _assign_current_shift():
+    resident_ids = await register_all()
+    rooms = await database.get_all_rooms()
+    for i, room in enumerate(rooms):
+        await database.add_schedule_entry(resident_ids[i], room['id'], date.today())
+    return len(rooms)
+
+
+def test_each_reminder_wave_sends_a_new_message(run_db, monkeypatch):
+    monkeypatch.setattr(tasks, "REMINDER_DIGEST_MODE", True)
+
+    async def scenario():
+        residents = await _assign_current_shift()
+        bot = _FakeBot()
+
+        await tasks.send_reminders(bot)
+        assert len(bot.sent) == residents
+
+        # Повтор той же волны (например, перехват доли) не шлет дубликатов
+        await tasks.send_reminders(bot)
+        assert len(bot.sent) == residents and not bot.edited
+
+        # Следующая волна смены с тем же составом дежурств - снова новые сообщения
+        monkeypatch.setattr(tasks, "date", _days_later(2))
+        await tasks.send_reminders(bot)
+        assert len(bot.sent) == 2 * residents
+    run_db(scenario)
@@ -0,0 +1,77 @@
+# tests/test_rendering.py
+"""Экранирование Markdown и кэш отрисованных ответов (app/utils/rendering.py)."""
+from datetime import date
+
+import pytest
+
+from app.db import database
+from app.utils import rendering
+from app.utils.rendering import bold_md, escape_md
+from tests.conftest import register_all
+
+
+def test_escape_md():
+    assert escape_md("Комната_1 *[`") == "Комната\\_1 \\*\\[\\`"
+    assert escape_md(42) == "42"
+
+
+def test_bold_md_moves_asterisks_outside_the_entity():
+    assert bold_md("Кухня") == "*Кухня*"
+    # Внутри сущности экранирование не работает: '*' выводится между двумя сущностями
+    assert bold_md("A*B") == "*A*\\**B*"
+    assert bold_md("snake_case") == "*snake_case*"
+
+
+def test_resident_stats_title_is_one_bold_entity():
+    totals = {"name": "Вася_*", "assigned": 0}
+    title = rendering.render_resident_stats((totals, [])).split("\n")[0]
+    assert title == "📊 *Статистика уборок: Вася_*\\***"
+
+
+@pytest.fixture
+def render_cache(monkeypatch):
+    monkeypatch.setattr(rendering, "_RENDER_CACHE", {})
+
+
+def test_schedule_cache_hits_until_data_changes(run_db, render_cache, monkeypatch):
+    loads = []
+
+    async def counting_load():
+        loads.append(1)
+        return await database.get_current_week_schedule()
+    monkeypatch.setattr(rendering, "get_current_week_schedule", counting_load)
+
+    async def scenario():
+        resident_ids = await register_all()
+        rooms = await database.get_all_rooms()
+        schedule_id = await database.add_schedule_entry(resident_ids[0], rooms[0]['id'], date.today())
+
+        text = await rendering.get_schedule_text()
+        assert await rendering.get_schedule_text() == text
+        assert len(loads) == 1
+
+        # Служебные записи не сбрасывают кэш
+        await database.acquire_job_lease("job:slot", "worker-a", 60)
+        await database.save_reminder_message(1000 + resident_ids[0], "reminder", 1, str(schedule_id))
+        await database.claim_notifications("worker-a", 60)
+        await database.release_notification_claims("worker-a")
+        assert await rendering.get_schedule_text() == text
+        assert len(loads) == 1
+
+        # Изменение расписания - сбрасывает
+        await database.complete_duty(schedule_id)
+        assert await rendering.get_schedule_text() != text
+        assert len(loads) == 2
+    run_db(scenario)
+
+
+def test_cache_expires_after_ttl(run_db, render_cache):
+    async def scenario():
+        await rendering.get_ratings_text()
+        version, rendered_at, text = rendering._RENDER_CACHE["ratings"]
+        expired_at = rendered_at - rendering.RENDER_CACHE_TTL_SECONDS - 1
+        rendering._RENDER_CACHE["ratings"] = (version, expired_at, text)
+
+        assert await rendering.get_ratings_text() == text
+        assert rendering._RENDER_CACHE["ratings"][1] > expired_at
+    run_db(scenario)
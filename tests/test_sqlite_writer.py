@@ -0,0 +1,82 @@
+# tests/test_sqlite_writer.py
+"""Групповой писатель SQLite (app/db/backends/sqlite.py): пачки, SAVEPOINT, отмена, остановка."""
+import asyncio
+
+import pytest
+
+from app.db import database
+
+
+async def _room_names():
+    async with database._backend.read() as db:
+        return {row[0] for row in await db.fetchall("SELECT name FROM rooms")}
+
+
+def _insert_room(name, fail=False):
+    async def op(db):
+        await db.execute("INSERT INTO rooms (name) VALUES (?)", (name,))
+        if fail:
+            raise RuntimeError(f"ошибка в {name}")
+        return name
+    return op
+
+
+def test_failing_op_rolls_back_only_its_savepoint(run_sqlite, sqlite_backend, monkeypatch):
+    batch_sizes = []
+    commit_batch = type(sqlite_backend)._commit_batch
+
+    async def recording_commit_batch(self, db, batch):
+        batch_sizes.append(len(batch))
+        await commit_batch(self, db, batch)
+    monkeypatch.setattr(type(sqlite_backend), "_commit_batch", recording_commit_batch)
+
+    async def scenario():
+        results = await asyncio.gather(
+            sqlite_backend.write(_insert_room("Балкон")),
+            sqlite_backend.write(_insert_room("Чердак", fail=True)),
+            sqlite_backend.write(_insert_room("Подвал")),
+            return_exceptions=True,
+        )
+        assert results[0] == "Балкон" and results[2] == "Подвал"
+        assert isinstance(results[1], RuntimeError)
+        assert batch_sizes[-1] == 3  # Все три операции ушли одной транзакцией
+
+        names = await _room_names()
+        assert {"Балкон", "Подвал"} <= names
+        assert "Чердак" not in names
+    run_sqlite(scenario)
+
+
+def test_cancelled_caller_does_not_break_writer(run_sqlite, sqlite_backend):
+    async def scenario():
+        started = asyncio.Event()
+
+        async def slow_op(db):
+            started.set()
+            await asyncio.sleep(0.05)
+            await db.execute("INSERT INTO rooms (name) VALUES (?)", ("Кладовка",))
+
+        caller = asyncio.create_task(sqlite_backend.write(slow_op))
+        await started.wait()
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+
+        # Писатель жив и обслуживает следующие записи
+        assert await sqlite_backend.write(_insert_room("Прихожая")) == "Прихожая"
+        assert not sqlite_backend._writer_task.done()
+        assert {"Кладовка", "Прихожая"} <= await _room_names()
+    run_sqlite(scenario)
+
+
+def test_close_db_drains_queued_writes(run_sqlite, sqlite_backend):
+    async def scenario():
+        names = [f"Комната {i}" for i in range(50)]
+        writes = [asyncio.create_task(database._write(_insert_room(name))) for name in names]
+        await asyncio.sleep(0)  # Даем задачам встать в очередь писателя
+
+        await database.close_db()
+        assert all(write.done() for write in writes)
+        assert [write.result() for write in writes] == names
+        assert set(names) <= await _room_names()
+    run_sqlite(scenario)